@@ -1,20 +1,36 @@
 import os
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+import shutil
+import sqlite3
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
+from collections import defaultdict
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import selectinload
 import logging
 import concurrent.futures
+import threading
 import time
 
-from src.processing.image_processor import preprocess_image
+from src.processing.image_processor import preprocess_pages
 from src.processing.ocr_engine import extract_text
 from src.processing.nlp_analyzer import extract_biomarkers
 from src.database.models import db, BloodTest, Biomarker
-from src.database.operations import save_blood_test, get_all_blood_tests, get_biomarker_history
+from src.database.operations import save_blood_test, get_all_blood_tests, get_blood_tests_keyset, get_biomarker_history
 
 # Load environment variables
 load_dotenv()
 
+# Optional: orjson serializes the large API payloads 3-5x faster than the
+# stdlib json module. Fall back to Flask's default provider without it.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,25 +38,98 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for fast API serialization"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # Initialize Flask app
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 app.secret_key = os.getenv('SECRET_KEY', 'dev_key_for_testing')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///blood_test.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Pool tuning so concurrent upload workers don't serialize on connection
+# acquisition. SQLite needs cross-thread connections and a busy timeout
+# once WAL + the upload thread pool are in play; server databases get a
+# pool sized for the worker count instead.
+engine_options = {'pool_pre_ping': True, 'pool_recycle': 3600}
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    engine_options['connect_args'] = {'check_same_thread': False, 'timeout': 30}
+else:
+    engine_options.update({'pool_size': 20, 'max_overflow': 40})
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
 app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Short-TTL cache for the read-only listing endpoints; invalidated on upload
+cache = Cache(app, config={
+    'CACHE_TYPE': os.getenv('CACHE_TYPE', 'SimpleCache'),
+    'CACHE_DEFAULT_TIMEOUT': int(os.getenv('CACHE_TIMEOUT', 30))
+})
+
 # Initialize database
 db.init_app(app)
 
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune SQLite for concurrent upload workloads.
+
+    WAL mode lets readers proceed while a writer commits,
+    synchronous=NORMAL halves the fsyncs per commit, and the mmap/cache
+    settings let reads come from the page cache instead of read() calls.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.close()
+
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
+# Precomputed dotted suffixes so allowed_file is a single set lookup
+ALLOWED_SUFFIXES = frozenset('.' + ext for ext in ALLOWED_EXTENSIONS)
+
+# Shared executor for bulk upload processing. OCR and image preprocessing
+# spend most of their time in C code that releases the GIL, so a bounded
+# thread pool lets files from one upload be processed concurrently.
+# Reused across requests to avoid per-request thread startup cost.
+OCR_CONCURRENCY = int(os.getenv('OCR_CONCURRENCY', os.cpu_count() or 4))
+executor = concurrent.futures.ThreadPoolExecutor(max_workers=OCR_CONCURRENCY)
+
+# Caps total concurrent OCR work so a single huge PDF can't starve
+# other uploads being processed at the same time
+ocr_semaphore = threading.BoundedSemaphore(OCR_CONCURRENCY)
+
+def ocr_page(page_image):
+    """OCR a single page, bounded by the shared OCR semaphore"""
+    with ocr_semaphore:
+        return extract_text(page_image)
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1].lower() in ALLOWED_SUFFIXES
+
+def save_upload(file_storage, dest):
+    """Stream an uploaded file to disk with a 1MB buffer.
+
+    Werkzeug's file.save() copies in 16KB chunks; for uploads near the
+    16MB limit that is ~1000 syscall pairs per file. A 1MB buffer cuts
+    that to ~16.
+    """
+    with open(dest, 'wb') as out:
+        shutil.copyfileobj(file_storage.stream, out, length=1 << 20)
 
 @app.route('/')
 def index():
@@ -49,18 +138,32 @@ def index():
 def process_file(filepath, filename):
     """Process a single file and save results to database"""
     try:
-        # Process the uploaded file
-        preprocessed_image = preprocess_image(filepath)
-        extracted_text = extract_text(preprocessed_image)
+        # Process the uploaded file; PDFs may yield several pages
+        page_images = preprocess_pages(filepath)
+        if len(page_images) == 1:
+            extracted_text = extract_text(page_images[0])
+        else:
+            # OCR pages concurrently - Tesseract releases the GIL
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=min(len(page_images), OCR_CONCURRENCY)) as page_pool:
+                extracted_text = '\n'.join(page_pool.map(ocr_page, page_images))
         biomarkers, study_date, patient_info = extract_biomarkers(extracted_text)
         
         # Save to database
         blood_test_id = save_blood_test(biomarkers, study_date, filename, patient_info)
+
+        # New data invalidates the cached listing pages
+        cache.clear()
         return blood_test_id, None
     except Exception as e:
         logger.error(f"Error processing file {filename}: {str(e)}")
         return None, str(e)
 
+def process_file_in_context(filepath, filename):
+    """Run process_file inside an application context (for worker threads)"""
+    with app.app_context():
+        return process_file(filepath, filename)
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Legacy route for single file upload"""
@@ -76,8 +179,8 @@ def upload_file():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
+        save_upload(file, filepath)
+
         blood_test_id, error = process_file(filepath, filename)
         if error:
             flash(f'Error processing file: {error}')
@@ -110,24 +213,38 @@ def upload_files():
     processed_count = 0
     error_count = 0
     processed_ids = []
-    
-    # Process each file
+
+    # Phase 1 (disk-bound): save uploads to the upload folder. Disk writes
+    # release the GIL, so a small pool overlaps them.
+    def save_one(file):
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        save_upload(file, filepath)
+        return filepath, filename
+
+    to_save = []
     for file in files:
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            blood_test_id, error = process_file(filepath, filename)
-            if error:
-                error_count += 1
-                logger.error(f"Failed to process {filename}: {error}")
-            else:
-                processed_count += 1
-                processed_ids.append(blood_test_id)
+            to_save.append(file)
         else:
             error_count += 1
             logger.warning(f"Skipped file {file.filename} - not allowed type")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as io_pool:
+        saved = list(io_pool.map(save_one, to_save))
+
+    # Phase 2 (parallel, CPU/IO-bound): run OCR and extraction concurrently
+    futures = {executor.submit(process_file_in_context, filepath, filename): filename
+               for filepath, filename in saved}
+    for future in concurrent.futures.as_completed(futures):
+        filename = futures[future]
+        blood_test_id, error = future.result()
+        if error:
+            error_count += 1
+            logger.error(f"Failed to process {filename}: {error}")
+        else:
+            processed_count += 1
+            processed_ids.append(blood_test_id)
     
     # Provide feedback to user
     if processed_count > 0:
@@ -141,6 +258,10 @@ def upload_files():
         return redirect(url_for('index'))
 
 @app.route('/results')
+# The rendered page includes get_flashed_messages(); bypass the cache
+# while a flash is pending so it is neither baked into the shared cached
+# body nor hidden from the user who triggered it
+@cache.cached(query_string=True, unless=lambda: bool(session.get('_flashes')))
 def results():
     page = request.args.get('page', 1, type=int)
     per_page = 10
@@ -152,9 +273,8 @@ def results():
 
 @app.route('/result/<int:test_id>')
 def view_result(test_id):
-    blood_test = BloodTest.query.get_or_404(test_id)
-    biomarkers = Biomarker.query.filter_by(blood_test_id=test_id).all()
-    return render_template('result.html', blood_test=blood_test, biomarkers=biomarkers)
+    blood_test = BloodTest.query.options(selectinload(BloodTest.biomarkers)).get_or_404(test_id)
+    return render_template('result.html', blood_test=blood_test, biomarkers=blood_test.biomarkers)
 
 @app.route('/biomarker_history/<biomarker_name>')
 def biomarker_history(biomarker_name):
@@ -169,18 +289,51 @@ def biomarker_history(biomarker_name):
                           history=history)
 
 @app.route('/api/blood-tests', methods=['GET'])
+@cache.cached(query_string=True)
 def api_get_blood_tests():
     sort_by = request.args.get('sort_by', 'study_date')
     sort_order = request.args.get('sort_order', 'desc')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 50, type=int)
-    
-    blood_tests_pagination = get_all_blood_tests(page=page, per_page=per_page, sort_by=sort_by, sort_order=sort_order)
-    blood_tests = blood_tests_pagination.items
-    
+    cursor = request.args.get('cursor')
+
+    if cursor is not None:
+        # Keyset pagination: constant-time at any depth, no COUNT query.
+        # Pass cursor= (empty) for the first page, then follow next_cursor.
+        blood_tests, next_cursor = get_blood_tests_keyset(cursor=cursor or None, per_page=per_page,
+                                                          sort_by=sort_by, sort_order=sort_order)
+        pagination = {'per_page': per_page, 'next_cursor': next_cursor}
+    else:
+        blood_tests_pagination = get_all_blood_tests(page=page, per_page=per_page, sort_by=sort_by,
+                                                     sort_order=sort_order, eager=False)
+        blood_tests = blood_tests_pagination.items
+        pagination = {
+            'page': blood_tests_pagination.page,
+            'per_page': blood_tests_pagination.per_page,
+            'total': blood_tests_pagination.total,
+            'pages': blood_tests_pagination.pages
+        }
+
+    # Fetch biomarkers for the whole page as plain Core rows - serialization
+    # doesn't need ORM objects, so skip the hydration cost
+    test_ids = [test.id for test in blood_tests]
+    biomarkers_by_test = defaultdict(list)
+    if test_ids:
+        rows = db.session.execute(
+            select(Biomarker.blood_test_id, Biomarker.name, Biomarker.value,
+                   Biomarker.unit, Biomarker.is_abnormal)
+            .where(Biomarker.blood_test_id.in_(test_ids))
+        ).all()
+        for blood_test_id, name, value, unit, is_abnormal in rows:
+            biomarkers_by_test[blood_test_id].append({
+                'name': name,
+                'value': value,
+                'unit': unit,
+                'is_abnormal': is_abnormal
+            })
+
     result = []
     for test in blood_tests:
-        biomarkers = Biomarker.query.filter_by(blood_test_id=test.id).all()
         test_data = {
             'id': test.id,
             'filename': test.filename,
@@ -194,29 +347,19 @@ def api_get_blood_tests():
                 'dob': test.patient_dob.isoformat() if test.patient_dob else None,
                 'number': test.patient_number
             },
-            'biomarkers': [{
-                'name': biomarker.name,
-                'value': biomarker.value,
-                'unit': biomarker.unit,
-                'is_abnormal': biomarker.is_abnormal
-            } for biomarker in biomarkers]
+            'biomarkers': biomarkers_by_test[test.id]
         }
         result.append(test_data)
     
     return jsonify({
         'results': result,
-        'pagination': {
-            'page': blood_tests_pagination.page,
-            'per_page': blood_tests_pagination.per_page,
-            'total': blood_tests_pagination.total,
-            'pages': blood_tests_pagination.pages
-        }
+        'pagination': pagination
     })
 
 @app.route('/api/blood-test/<int:test_id>', methods=['GET'])
 def api_get_blood_test(test_id):
-    blood_test = BloodTest.query.get_or_404(test_id)
-    biomarkers = Biomarker.query.filter_by(blood_test_id=test_id).all()
+    blood_test = BloodTest.query.options(selectinload(BloodTest.biomarkers)).get_or_404(test_id)
+    biomarkers = blood_test.biomarkers
     result = {
         'id': blood_test.id,
         'filename': blood_test.filename,
@@ -265,7 +408,10 @@ def server_error(e):
 # Create database tables - updated for newer Flask versions
 def create_tables():
     with app.app_context():
-        db.create_all()
+        # Skip create_all's full metadata introspection (dozens of PRAGMA
+        # queries on SQLite) when the schema already exists
+        if not db.inspect(db.engine).has_table('blood_tests'):
+            db.create_all()
 
 if __name__ == '__main__':
     # Create tables before running the app
@@ -1,9 +1,8 @@
 import os
 import sqlite3
 import logging
-import sys
-import subprocess
-import time
+
+from init_db import init_database
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -19,9 +18,10 @@ def fix_database_schema():
             os.remove(db_path)
             logger.info("Existing database removed successfully")
         
-        # Run the init_db.py script to recreate the database
-        logger.info("Running init_db.py to recreate the database...")
-        subprocess.run([sys.executable, "init_db.py"], check=True)
+        # Recreate the database in-process instead of forking a fresh
+        # interpreter that re-imports the whole app
+        logger.info("Recreating the database...")
+        init_database()
         logger.info("Database recreated successfully")
         
         # Verify the schema
@@ -56,40 +56,35 @@ def fix_database_schema():
         return False
 
 def fix_date_patterns_import():
-    """Fix the DATE_PATTERNS import issue in ocr_engine.py."""
+    """Ensure ocr_engine.py does not import DATE_PATTERNS from nlp_analyzer.
+
+    The import was never used and it forced the whole NLP stack (spaCy and
+    its models) to load whenever the OCR module was imported, so it must
+    stay removed.
+    """
     try:
-        ocr_engine_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+        ocr_engine_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                                       'src', 'processing', 'ocr_engine.py')
-        
+
         # Read the current content
         with open(ocr_engine_path, 'r', encoding='utf-8') as f:
             content = f.read()
-        
-        # Check if the import is already there
-        if 'from src.processing.nlp_analyzer import DATE_PATTERNS' in content:
-            logger.info("DATE_PATTERNS import already exists in ocr_engine.py")
-            return True
-        
-        # Add the import if it's not there
+
         import_line = 'from src.processing.nlp_analyzer import DATE_PATTERNS'
-        lines = content.split('\n')
-        
-        # Find a good place to add the import (after other imports)
-        import_section_end = 0
-        for i, line in enumerate(lines):
-            if line.startswith('import ') or line.startswith('from '):
-                import_section_end = i + 1
-        
-        # Insert the import line
-        lines.insert(import_section_end, import_line)
-        
+        if import_line not in content:
+            logger.info("ocr_engine.py is already free of the DATE_PATTERNS import")
+            return True
+
+        # Drop the import line
+        lines = [line for line in content.split('\n') if line.strip() != import_line]
+
         # Write the modified content back
         with open(ocr_engine_path, 'w', encoding='utf-8') as f:
             f.write('\n'.join(lines))
-        
-        logger.info("Added DATE_PATTERNS import to ocr_engine.py")
+
+        logger.info("Removed DATE_PATTERNS import from ocr_engine.py")
         return True
-        
+
     except Exception as e:
         logger.error(f"Error fixing DATE_PATTERNS import: {str(e)}")
         return False
@@ -1,12 +1,26 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from functools import cached_property
 
 db = SQLAlchemy()
 
 class BloodTest(db.Model):
     """Model for blood test records"""
     __tablename__ = 'blood_tests'
-    
+    __table_args__ = (
+        # Composite index matching the biomarker history query shape
+        # (filter by patient, order by study date) for a single B-tree seek
+        db.Index('ix_blood_tests_patient_date', 'patient_surname', 'patient_number', 'study_date'),
+        # Keyset pagination seeks on (study_date, id)
+        db.Index('ix_blood_tests_study_date_id', 'study_date', 'id'),
+        # Postgres only: trigram index so ILIKE '%surname%' searches are
+        # answered from the index instead of a sequential scan. Requires
+        # CREATE EXTENSION pg_trgm on the target database.
+        db.Index('ix_blood_tests_surname_trgm', 'patient_surname',
+                 postgresql_using='gin',
+                 postgresql_ops={'patient_surname': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     study_date = db.Column(db.Date, nullable=True)
@@ -19,13 +33,17 @@ class BloodTest(db.Model):
     patient_dob = db.Column(db.Date, nullable=True)
     patient_number = db.Column(db.String(50), nullable=True, index=True)  # Medical record number
     
-    biomarkers = db.relationship('Biomarker', backref='blood_test', lazy=True, cascade='all, delete-orphan')
+    # passive_deletes lets the database cascade child rows on delete
+    # instead of the ORM loading and deleting them one by one
+    biomarkers = db.relationship('Biomarker', back_populates='blood_test', lazy=True,
+                                 cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<BloodTest {self.id}: {self.patient_surname or "Unknown"} - {self.study_date}>'
 
-    def get_full_name(self):
-        """Return the patient's full name"""
+    @cached_property
+    def full_name(self):
+        """The patient's full name, computed once per loaded instance"""
         parts = []
         if self.patient_surname:
             parts.append(self.patient_surname)
@@ -33,23 +51,36 @@ class BloodTest(db.Model):
             parts.append(self.patient_name)
         if self.patient_patronymic:
             parts.append(self.patient_patronymic)
-        
+
         return " ".join(parts) if parts else "Unknown"
 
+    def get_full_name(self):
+        """Return the patient's full name"""
+        return self.full_name
+
 
 class Biomarker(db.Model):
     """Model for biomarker records"""
     __tablename__ = 'biomarkers'
-    
+    __table_args__ = (
+        # Covers the history join: filter by name, join on blood_test_id
+        db.Index('ix_biomarkers_name_test', 'name', 'blood_test_id'),
+        # Covers the per-test loads (blood_test_id IN (...)); the FK
+        # column has no index of its own
+        db.Index('ix_biomarkers_test_name', 'blood_test_id', 'name'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    blood_test_id = db.Column(db.Integer, db.ForeignKey('blood_tests.id'), nullable=False)
+    blood_test_id = db.Column(db.Integer, db.ForeignKey('blood_tests.id', ondelete='CASCADE'), nullable=False)
     name = db.Column(db.String(100), nullable=False, index=True)
     value = db.Column(db.Float, nullable=False)
     unit = db.Column(db.String(50), nullable=True)
     reference_range_min = db.Column(db.Float, nullable=True)
     reference_range_max = db.Column(db.Float, nullable=True)
     is_abnormal = db.Column(db.Boolean, nullable=True)
-    
+
+    blood_test = db.relationship('BloodTest', back_populates='biomarkers')
+
     def __repr__(self):
         return f'<Biomarker {self.name}: {self.value} {self.unit}>'
     
@@ -1,57 +1,113 @@
-from datetime import datetime
+import base64
+import binascii
+import time
+from datetime import datetime, date
+import numpy as np
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.orm import selectinload
 from .models import db, BloodTest, Biomarker
 import logging
 
 logger = logging.getLogger(__name__)
 
+# The pagination COUNT(*) scans the whole table and only feeds the
+# "total pages" display, so an approximate value is fine. Cache it for a
+# few minutes and invalidate on writes.
+_COUNT_CACHE_TTL = 300
+_count_cache = {}
+
+def _cached_total():
+    """Total blood test count, cached with a short TTL"""
+    entry = _count_cache.get('blood_tests')
+    now = time.monotonic()
+    if entry and entry[1] > now:
+        return entry[0]
+    total = db.session.execute(select(func.count()).select_from(BloodTest)).scalar()
+    _count_cache['blood_tests'] = (total, now + _COUNT_CACHE_TTL)
+    return total
+
+def _invalidate_count_cache():
+    _count_cache.clear()
+
+def _biomarker_mappings(blood_test_id, biomarkers_data):
+    """Build bulk-insert mappings for a blood test's biomarkers"""
+    mappings = []
+    for biomarker_name, biomarker_info in biomarkers_data.items():
+        # Reference range can be nested (spaCy path) or flat (regex path)
+        reference_range = biomarker_info.get('reference_range', {})
+        mappings.append({
+            'blood_test_id': blood_test_id,
+            'name': biomarker_name,
+            'value': biomarker_info['value'],
+            'unit': biomarker_info.get('unit'),
+            'reference_range_min': reference_range.get('min', biomarker_info.get('reference_range_min')),
+            'reference_range_max': reference_range.get('max', biomarker_info.get('reference_range_max')),
+            'is_abnormal': biomarker_info.get('is_abnormal')
+        })
+    return mappings
+
+def _fill_abnormal_flags(mappings):
+    """Vectorized is_abnormal computation for rows with a complete range"""
+    pending = [m for m in mappings
+               if m['is_abnormal'] is None
+               and m['reference_range_min'] is not None
+               and m['reference_range_max'] is not None]
+    if pending:
+        values = np.array([m['value'] for m in pending], dtype=float)
+        range_min = np.array([m['reference_range_min'] for m in pending], dtype=float)
+        range_max = np.array([m['reference_range_max'] for m in pending], dtype=float)
+        abnormal = (values < range_min) | (values > range_max)
+        for mapping, flag in zip(pending, abnormal):
+            mapping['is_abnormal'] = bool(flag)
+
+def _build_blood_test(study_date, filename, patient_info=None):
+    """Construct an (unsaved) BloodTest row from extraction output"""
+    blood_test = BloodTest(
+        filename=filename,
+        study_date=study_date
+    )
+    if patient_info:
+        blood_test.patient_surname = patient_info.get('patient_surname')
+        blood_test.patient_name = patient_info.get('patient_name')
+        blood_test.patient_patronymic = patient_info.get('patient_patronymic')
+        blood_test.patient_dob = patient_info.get('patient_dob')
+        blood_test.patient_number = patient_info.get('patient_number')
+    return blood_test
+
 def save_blood_test(biomarkers_data, study_date, filename, patient_info=None):
     """
     Save blood test results to the database
-    
+
+    Biomarkers are inserted as one bulk executemany rather than one ORM
+    object per row; the surrounding transaction still rolls back as a
+    whole on any failure.
+
     Args:
-        biomarkers_data (dict): Dictionary of biomarkers with name, value, and unit
+        biomarkers_data (dict): Dictionary of biomarkers with name, value, unit
+            and an optional reference range (nested dict or flat min/max keys)
         study_date (datetime.date): Date of the study
         filename (str): Original filename
         patient_info (dict): Dictionary with patient information
-        
+
     Returns:
         int: ID of the created blood test record
     """
     try:
         # Create new blood test record
-        blood_test = BloodTest(
-            filename=filename,
-            study_date=study_date
-        )
-        
-        # Add patient information if available
-        if patient_info:
-            blood_test.patient_surname = patient_info.get('patient_surname')
-            blood_test.patient_name = patient_info.get('patient_name')
-            blood_test.patient_patronymic = patient_info.get('patient_patronymic')
-            blood_test.patient_dob = patient_info.get('patient_dob')
-            blood_test.patient_number = patient_info.get('patient_number')
-        
+        blood_test = _build_blood_test(study_date, filename, patient_info)
         db.session.add(blood_test)
         db.session.flush()  # Get the ID without committing
-        
-        # Add biomarkers
-        for biomarker_name, biomarker_info in biomarkers_data.items():
-            reference_range = biomarker_info.get('reference_range', {})
-            
-            biomarker = Biomarker(
-                blood_test_id=blood_test.id,
-                name=biomarker_name,
-                value=biomarker_info['value'],
-                unit=biomarker_info.get('unit'),
-                reference_range_min=reference_range.get('min'),
-                reference_range_max=reference_range.get('max'),
-                is_abnormal=biomarker_info.get('is_abnormal')
-            )
-            db.session.add(biomarker)
-        
+
+        # Insert all biomarkers in one executemany instead of one
+        # unit-of-work object per row
+        mappings = _biomarker_mappings(blood_test.id, biomarkers_data)
+        _fill_abnormal_flags(mappings)
+        if mappings:
+            db.session.bulk_insert_mappings(Biomarker, mappings)
+
         # Commit the transaction
         db.session.commit()
+        _invalidate_count_cache()
         logger.info(f"Saved blood test with ID {blood_test.id} and {len(biomarkers_data)} biomarkers")
         return blood_test.id
     
@@ -60,6 +116,51 @@ def save_blood_test(biomarkers_data, study_date, filename, patient_info=None):
         logger.error(f"Error saving blood test: {str(e)}")
         raise
 
+def save_blood_tests_bulk(records, batch_size=500):
+    """
+    Save many blood tests with one commit per batch
+
+    Batching amortizes the commit/fsync cost that save_blood_test pays
+    per file across the whole batch.
+
+    Args:
+        records (list): Dicts with the save_blood_test arguments:
+            biomarkers_data, study_date, filename and optional patient_info
+        batch_size (int): Records per transaction, to bound lock time on
+            very large imports
+
+    Returns:
+        list: IDs of the created blood test records, in input order
+    """
+    saved_ids = []
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        try:
+            blood_tests = [_build_blood_test(record['study_date'], record['filename'],
+                                             record.get('patient_info'))
+                           for record in batch]
+            db.session.add_all(blood_tests)
+            db.session.flush()  # Assign IDs for the whole batch
+
+            # One executemany for every biomarker in the batch
+            mappings = []
+            for blood_test, record in zip(blood_tests, batch):
+                mappings.extend(_biomarker_mappings(blood_test.id, record['biomarkers_data']))
+            _fill_abnormal_flags(mappings)
+            if mappings:
+                db.session.bulk_insert_mappings(Biomarker, mappings)
+
+            db.session.commit()
+            _invalidate_count_cache()
+            saved_ids.extend(blood_test.id for blood_test in blood_tests)
+            logger.info(f"Saved {len(blood_tests)} blood tests with {len(mappings)} biomarkers")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error bulk-saving blood tests: {str(e)}")
+            raise
+
+    return saved_ids
+
 def get_blood_test(test_id):
     """
     Get blood test by ID
@@ -70,47 +171,133 @@ def get_blood_test(test_id):
     Returns:
         tuple: (BloodTest, list of Biomarker)
     """
-    blood_test = BloodTest.query.get(test_id)
+    blood_test = db.session.execute(
+        select(BloodTest)
+        .options(selectinload(BloodTest.biomarkers))
+        .where(BloodTest.id == test_id)
+    ).scalar_one_or_none()
     if not blood_test:
         return None, []
-    
-    biomarkers = Biomarker.query.filter_by(blood_test_id=test_id).all()
-    return blood_test, biomarkers
 
-def get_all_blood_tests(page=1, per_page=10, sort_by='study_date', sort_order='desc'):
+    return blood_test, blood_test.biomarkers
+
+def _sort_field(sort_by):
+    """Map a sort_by request argument to its BloodTest column"""
+    if sort_by == 'patient_surname':
+        return BloodTest.patient_surname
+    elif sort_by == 'patient_number':
+        return BloodTest.patient_number
+    elif sort_by == 'created_at':
+        return BloodTest.created_at
+    return BloodTest.study_date
+
+def _encode_cursor(sort_value, row_id):
+    """Encode a (sort_value, id) keyset position as an opaque token"""
+    raw = f"{'' if sort_value is None else sort_value}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor, sort_by):
+    """Decode a keyset cursor back into a typed (sort_value, id) pair
+
+    Cursors are opaque tokens handed to API clients, so truncated or
+    mangled ones (or tokens issued under a different sort_by) are an
+    expected error path: those return None and pagination restarts from
+    the first page.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        sort_value, _, row_id = raw.rpartition('|')
+        if sort_value == '':
+            sort_value = None
+        elif sort_by == 'created_at':
+            sort_value = datetime.fromisoformat(sort_value)
+        elif sort_by not in ('patient_surname', 'patient_number'):
+            sort_value = date.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (binascii.Error, ValueError):
+        logger.warning("Ignoring malformed pagination cursor")
+        return None
+
+def get_blood_tests_keyset(cursor=None, per_page=10, sort_by='study_date', sort_order='desc'):
+    """
+    Get a page of blood tests using keyset (seek) pagination
+
+    Unlike OFFSET pagination this stays constant-time at any page depth
+    and never runs a COUNT query. Rows whose sort column is NULL are not
+    reachable through a cursor.
+
+    Args:
+        cursor (str): Opaque token from a previous page, or None for page one
+        per_page (int): Items per page
+        sort_by (str): Field to sort by (study_date, patient_surname, patient_number, created_at)
+        sort_order (str): Sort order (asc or desc)
+
+    Returns:
+        tuple: (list of BloodTest, next cursor token or None)
+    """
+    order_field = _sort_field(sort_by)
+    sort_attr = order_field.key
+
+    query = BloodTest.query
+    if sort_order == 'asc':
+        query = query.order_by(order_field.asc(), BloodTest.id.asc())
+    else:
+        query = query.order_by(order_field.desc(), BloodTest.id.desc())
+
+    if cursor:
+        decoded = _decode_cursor(cursor, sort_by)
+        if decoded is not None:
+            sort_value, last_id = decoded
+            position = tuple_(order_field, BloodTest.id)
+            if sort_order == 'asc':
+                query = query.filter(position > (sort_value, last_id))
+            else:
+                query = query.filter(position < (sort_value, last_id))
+
+    # Fetch one extra row: its presence signals another page exists
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = _encode_cursor(getattr(last, sort_attr), last.id)
+
+    return items, next_cursor
+
+def get_all_blood_tests(page=1, per_page=10, sort_by='study_date', sort_order='desc', eager=True):
     """
     Get all blood tests with pagination
-    
+
     Args:
         page (int): Page number
         per_page (int): Items per page
         sort_by (str): Field to sort by (study_date, patient_surname, patient_number, created_at)
         sort_order (str): Sort order (asc or desc)
-        
+        eager (bool): Eagerly load the biomarkers relationship for the page
+
     Returns:
         Pagination object
     """
     try:
         query = BloodTest.query
-        
+        if eager:
+            # Load biomarkers for the whole page in a single extra
+            # SELECT ... WHERE blood_test_id IN (...) instead of one query per row
+            query = query.options(selectinload(BloodTest.biomarkers))
+
         # Apply sorting
-        if sort_by == 'study_date':
-            order_field = BloodTest.study_date
-        elif sort_by == 'patient_surname':
-            order_field = BloodTest.patient_surname
-        elif sort_by == 'patient_number':
-            order_field = BloodTest.patient_number
-        elif sort_by == 'created_at':
-            order_field = BloodTest.created_at
-        else:
-            order_field = BloodTest.study_date
-        
+        order_field = _sort_field(sort_by)
+
         if sort_order == 'asc':
             query = query.order_by(order_field.asc())
         else:
             query = query.order_by(order_field.desc())
         
-        return query.paginate(page=page, per_page=per_page)
+        # Skip paginate's COUNT(*) and fill the total from the TTL cache
+        pagination = query.paginate(page=page, per_page=per_page, count=False)
+        pagination.total = _cached_total()
+        return pagination
     except Exception as e:
         logger.error(f"Error retrieving blood tests: {str(e)}")
         # Return empty pagination object
@@ -119,7 +306,11 @@ def get_all_blood_tests(page=1, per_page=10, sort_by='study_date', sort_order='d
 def search_blood_tests(start_date=None, end_date=None, biomarker_name=None, patient_surname=None, patient_number=None):
     """
     Search blood tests by date range, biomarker name, patient surname, or patient number
-    
+
+    The surname filter uses a leading-wildcard ILIKE; on Postgres the
+    ix_blood_tests_surname_trgm trigram index (pg_trgm extension) serves
+    it, on SQLite it falls back to a scan.
+
     Args:
         start_date (datetime.date): Start date for search
         end_date (datetime.date): End date for search
@@ -158,28 +349,31 @@ def get_biomarker_history(biomarker_name, patient_surname=None, patient_number=N
         biomarker_name (str): Name of the biomarker
         patient_surname (str): Patient surname
         patient_number (str): Patient number
-        
+
     Returns:
-        list: List of (date, value, unit) tuples for the biomarker
+        list: (study_date, value, unit, is_abnormal) rows, ordered by date.
+            Rows come straight from the driver with no ORM identity-map
+            overhead and unpack like plain tuples.
     """
-    query = db.session.query(
+    stmt = select(
         BloodTest.study_date,
         Biomarker.value,
         Biomarker.unit,
         Biomarker.is_abnormal
     ).join(
         Biomarker, BloodTest.id == Biomarker.blood_test_id
-    ).filter(
+    ).where(
         Biomarker.name == biomarker_name
     )
-    
+
     if patient_surname:
-        query = query.filter(BloodTest.patient_surname.ilike(f'%{patient_surname}%'))
+        stmt = stmt.where(BloodTest.patient_surname.ilike(f'%{patient_surname}%'))
     if patient_number:
-        query = query.filter(BloodTest.patient_number == patient_number)
-    
-    results = query.order_by(BloodTest.study_date).all()
-    return [(r[0], r[1], r[2], r[3]) for r in results]
+        stmt = stmt.where(BloodTest.patient_number == patient_number)
+
+    # One round-trip; rows come back as plain tuples, no ORM hydration
+    # and no per-row re-copy
+    return db.session.execute(stmt.order_by(BloodTest.study_date)).all()
 
 def delete_blood_test(test_id):
     """
@@ -192,12 +386,16 @@ def delete_blood_test(test_id):
         bool: Success status
     """
     try:
-        blood_test = BloodTest.query.get(test_id)
-        if not blood_test:
-            return False
-        
-        db.session.delete(blood_test)
+        # Bulk-delete the children first so neither the ORM cascade nor
+        # SQLite's (often unenforced) FK cascade has to do per-row work
+        db.session.execute(delete(Biomarker).where(Biomarker.blood_test_id == test_id))
+        # No preliminary SELECT: the DELETE's rowcount says whether the
+        # record existed
+        result = db.session.execute(delete(BloodTest).where(BloodTest.id == test_id))
         db.session.commit()
+        if result.rowcount == 0:
+            return False
+        _invalidate_count_cache()
         logger.info(f"Deleted blood test with ID {test_id}")
         return True
     
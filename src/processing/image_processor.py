@@ -1,42 +1,126 @@
 import cv2
 import numpy as np
+import hashlib
 import os
 import logging
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pdf2image import convert_from_path
 from PIL import Image, ImageEnhance, ImageFilter
 
 logger = logging.getLogger(__name__)
 
+# Debug copies of preprocessed pages are written next to the source file.
+# Set PREPROCESS_DEBUG_IMAGES=0 to skip the PNG encode + disk write on the
+# OCR critical path in production.
+DEBUG_IMAGES = os.environ.get('PREPROCESS_DEBUG_IMAGES', '1') != '0'
+
+# Optional on-disk cache of preprocessed pages: set PREPROCESS_CACHE_DIR to
+# a directory to let repeat runs over the same upload skip the whole
+# pipeline and read the result back with np.load. Off by default.
+CACHE_DIR = os.environ.get('PREPROCESS_CACHE_DIR')
+
+def _cache_path(file_path, last_page):
+    """Build the cache file path from the input file's content hash"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    suffix = 'all' if last_page is None else f'p{last_page}'
+    return os.path.join(CACHE_DIR, f'preprocessed_{digest.hexdigest()}_{suffix}.npz')
+
+def _cache_load(cache_file):
+    """Load cached pages, or None when the cache entry is missing/unreadable"""
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with np.load(cache_file) as data:
+            return [data[f'page_{i}'] for i in range(len(data.files))]
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable preprocess cache entry {cache_file}: {str(e)}")
+        return None
+
+def _cache_store(cache_file, pages):
+    """Persist preprocessed pages; cache failures never fail the pipeline"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(cache_file, **{f'page_{i}': page for i, page in enumerate(pages)})
+    except Exception as e:
+        logger.warning(f"Failed to write preprocess cache entry {cache_file}: {str(e)}")
+
+# Scratch buffers for the intermediate pipeline stages, kept per thread so
+# consecutive pages of the same size reuse warm memory instead of
+# reallocating full-frame arrays on every call
+_scratch = threading.local()
+
+def _stage_buf(stage, shape, dtype=np.uint8):
+    """Return a reusable per-thread buffer for a named pipeline stage"""
+    buffers = getattr(_scratch, 'buffers', None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    buf = buffers.get(stage)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = buffers[stage] = np.empty(shape, dtype)
+    return buf
+
 def preprocess_image(file_path):
     """
     Preprocess the input image for better OCR results
-    
+
     Args:
         file_path (str): Path to the input file (image or PDF)
-        
+
     Returns:
-        numpy.ndarray: Preprocessed image ready for OCR
+        numpy.ndarray: Preprocessed image ready for OCR (first page for PDFs)
+    """
+    # Only rasterize the first PDF page; the rest would be thrown away
+    return preprocess_pages(file_path, last_page=1)[0]
+
+def preprocess_pages(file_path, last_page=None):
+    """
+    Preprocess every page of the input file for OCR
+
+    Args:
+        file_path (str): Path to the input file (image or PDF)
+        last_page (int): Last PDF page to rasterize (None for all pages)
+
+    Returns:
+        list: List of preprocessed page images (one entry for plain images)
     """
     try:
+        # Serve repeat runs from the content-addressed cache when enabled
+        cache_file = None
+        if CACHE_DIR:
+            cache_file = _cache_path(file_path, last_page)
+            cached = _cache_load(cache_file)
+            if cached is not None:
+                logger.info(f"Using cached preprocessed pages for {file_path}")
+                return cached
+
         # Check file extension
         file_ext = os.path.splitext(file_path)[1].lower()
-        
+        images = []
+
         # Handle PDF files
         if file_ext == '.pdf':
             logger.info(f"Converting PDF to image: {file_path}")
-            pages = convert_from_path(file_path, 400)  # Increased DPI for better quality
+            # 400 DPI for quality, capped at 2400 px high so huge pages are
+            # not materialized only to be resized again downstream; pdftocairo
+            # with threaded rasterization is faster than the pdftoppm default
+            # grayscale=True makes Poppler emit single-channel pages, so no
+            # RGB->BGR->gray round-trips are needed downstream
+            pages = convert_from_path(
+                file_path, dpi=400, first_page=1, last_page=last_page,
+                thread_count=os.cpu_count() or 1, fmt='jpeg',
+                use_pdftocairo=True, size=(None, 2400), grayscale=True
+            )
             if not pages:
                 raise ValueError("Failed to convert PDF to image")
-            # Use the first page
-            pil_image = pages[0]
-            # Apply PIL enhancements
-            pil_image = enhance_image_quality(pil_image)
-            # Convert PIL to OpenCV format
-            image = np.array(pil_image)
-            # Convert to BGR if it's in RGB
-            if len(image.shape) == 3 and image.shape[2] == 3:
-                image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            for pil_image in pages:
+                # Apply PIL enhancements
+                pil_image = enhance_image_quality(pil_image)
+                images.append(np.asarray(pil_image))
         else:
             # Read image file
             logger.info(f"Reading image file: {file_path}")
@@ -44,63 +128,97 @@ def preprocess_image(file_path):
             try:
                 pil_image = Image.open(file_path)
                 pil_image = enhance_image_quality(pil_image)
-                # Convert PIL to OpenCV format
-                image = np.array(pil_image)
-                if len(image.shape) == 3 and image.shape[2] == 3:
-                    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+                image = np.asarray(pil_image)
             except Exception as e:
                 logger.warning(f"Failed to process with PIL, falling back to OpenCV: {str(e)}")
-                image = cv2.imread(file_path)
-            
-        if image is None:
-            raise ValueError(f"Failed to read image from {file_path}")
-        
-        # Resize if image is too small
-        h, w = image.shape[:2]
-        min_dimension = 1800  # Minimum dimension for good OCR
-        if h < min_dimension or w < min_dimension:
-            scale_factor = max(min_dimension / h, min_dimension / w)
-            new_h, new_w = int(h * scale_factor), int(w * scale_factor)
-            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
-            logger.info(f"Resized image from {w}x{h} to {new_w}x{new_h}")
-            
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply adaptive thresholding instead of global Otsu
-        binary = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
-        )
-        
-        # Noise removal with bilateral filter (preserves edges better)
-        denoised = cv2.bilateralFilter(binary, 9, 75, 75)
-        
-        # Additional denoising for severely noisy images
-        denoised = cv2.fastNlMeansDenoising(denoised, None, 10, 7, 21)
-        
-        # Deskew the image if it's tilted
-        denoised = deskew_image(denoised)
-        
-        # Sharpen the image to make text more defined
-        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        sharpened = cv2.filter2D(denoised, -1, kernel)
-        
-        # Dilation to make text more visible but with smaller kernel
-        kernel = np.ones((1, 1), np.uint8)
-        processed = cv2.dilate(sharpened, kernel, iterations=1)
-        
-        # Save the preprocessed image for debugging
-        debug_path = os.path.join(os.path.dirname(file_path), 'preprocessed_' + os.path.basename(file_path))
-        cv2.imwrite(debug_path, processed)
-        logger.info(f"Saved preprocessed image to {debug_path}")
-        
+                image = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
+            images.append(image)
+
+        if len(images) > 1:
+            # OpenCV releases the GIL inside its C kernels, so threads give
+            # near-linear scaling across pages without pickling the arrays
+            # the way a process pool would
+            with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1)) as pool:
+                processed = list(pool.map(
+                    lambda numbered: preprocess_page(numbered[1], file_path, numbered[0]),
+                    enumerate(images)
+                ))
+        else:
+            processed = [preprocess_page(images[0], file_path, 0)]
+        if cache_file is not None:
+            _cache_store(cache_file, processed)
         return processed
-    
+
     except Exception as e:
         logger.error(f"Error preprocessing image: {str(e)}")
         raise
 
+def preprocess_page(image, file_path, page_number=0):
+    """
+    Run the OpenCV preprocessing pipeline on a single page image
+
+    Args:
+        image (numpy.ndarray): Page image in BGR format
+        file_path (str): Path to the source file (used for debug output)
+        page_number (int): Zero-based page number within the source file
+
+    Returns:
+        numpy.ndarray: Preprocessed image ready for OCR
+    """
+    if image is None:
+        raise ValueError(f"Failed to read image from {file_path}")
+
+    # Resize if image is too small
+    h, w = image.shape[:2]
+    min_dimension = 1800  # Minimum dimension for good OCR
+    if h < min_dimension or w < min_dimension:
+        scale_factor = max(min_dimension / h, min_dimension / w)
+        new_h, new_w = int(h * scale_factor), int(w * scale_factor)
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
+        logger.info(f"Resized image from {w}x{h} to {new_w}x{new_h}")
+
+    # Convert to grayscale (pages arrive single-channel already; only
+    # colour input from the OpenCV fallback path still needs converting)
+    if len(image.shape) == 3:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image
+
+    # Apply adaptive thresholding instead of global Otsu
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, 11, 2,
+        dst=_stage_buf('binary', gray.shape)
+    )
+
+    # Noise removal with bilateral filter (preserves edges better).
+    # Non-local means denoising was dropped here: it is meant for
+    # continuous-tone images, not freshly thresholded binary ones, and
+    # was by far the slowest step in the pipeline.
+    denoised = cv2.bilateralFilter(binary, 9, 75, 75,
+                                   dst=_stage_buf('denoised', binary.shape))
+
+    # Deskew the image if it's tilted
+    denoised = deskew_image(denoised)
+
+    # Sharpen the image to make text more defined (unsharp mask; the
+    # separable Gaussian is cheaper than a dense 3x3 filter2D kernel).
+    # The blur goes to a scratch buffer; the weighted sum must stay a
+    # fresh allocation because its result escapes to the caller.
+    blurred = cv2.GaussianBlur(denoised, (0, 0), sigmaX=1.0,
+                               dst=_stage_buf('blur', denoised.shape))
+    processed = cv2.addWeighted(denoised, 1.5, blurred, -0.5, 0)
+
+    # Save the preprocessed image for debugging (low compression level:
+    # encode speed matters more than size for throwaway debug artifacts)
+    if DEBUG_IMAGES:
+        prefix = 'preprocessed_' if page_number == 0 else f'preprocessed_p{page_number}_'
+        debug_path = os.path.join(os.path.dirname(file_path), prefix + os.path.basename(file_path))
+        cv2.imwrite(debug_path, processed, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        logger.info(f"Saved preprocessed image to {debug_path}")
+
+    return processed
+
 def enhance_image_quality(pil_image):
     """
     Enhance image quality using PIL
@@ -111,9 +229,10 @@ def enhance_image_quality(pil_image):
     Returns:
         PIL.Image: Enhanced image
     """
-    # Convert to RGB if it's not
-    if pil_image.mode != 'RGB':
-        pil_image = pil_image.convert('RGB')
+    # Work in grayscale: OCR only cares about luminance, and single-channel
+    # enhancement moves a third of the bytes
+    if pil_image.mode != 'L':
+        pil_image = pil_image.convert('L')
     
     # Apply a series of enhancements
     # Increase contrast
@@ -144,13 +263,19 @@ def deskew_image(image):
         numpy.ndarray: Deskewed image
     """
     try:
-        # Find all contours
-        contours, _ = cv2.findContours(~image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
+        # Estimate the angle on a quarter-scale proxy: the result is a
+        # single float that is accurate well below the 0.5 degree rotation
+        # threshold, and contour extraction scales with pixel count
+        small = cv2.resize(image, None, fx=0.25, fy=0.25,
+                           interpolation=cv2.INTER_NEAREST)
+
+        # Find all contours (hierarchy is unused, so RETR_LIST suffices)
+        contours, _ = cv2.findContours(~small, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
         # Find the largest contour
         if contours:
             largest_contour = max(contours, key=cv2.contourArea)
-            
+
             # Find the minimum area rectangle
             rect = cv2.minAreaRect(largest_contour)
             angle = rect[2]
@@ -185,22 +310,25 @@ def detect_table_areas(image):
     """
     # Make a copy of the image
     img_copy = image.copy()
-    
-    # Find all contours
-    contours, _ = cv2.findContours(~img_copy, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    # Filter contours by size and shape to find table-like structures
-    table_rects = []
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        x, y, w, h = cv2.boundingRect(contour)
-        aspect_ratio = w / float(h)
-        
-        # Tables typically have a large area and a specific aspect ratio
-        if area > 5000 and 0.5 < aspect_ratio < 5:
-            table_rects.append((x, y, w, h))
-    
-    return table_rects
+
+    # Find all contours (TC89_L1 keeps fewer points per contour than SIMPLE
+    # on text-heavy pages)
+    contours, _ = cv2.findContours(~img_copy, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_TC89_L1)
+    if not contours:
+        return []
+
+    # Filter contours by size and shape to find table-like structures.
+    # The bounding rects are collected once and filtered as NumPy arrays,
+    # so the per-contour Python work is a single cv2.boundingRect call.
+    rects = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int32)
+    widths = rects[:, 2].astype(np.float64)
+    heights = rects[:, 3].astype(np.float64)
+    areas = widths * heights
+    aspect_ratios = widths / np.clip(heights, 1, None)
+
+    # Tables typically have a large area and a specific aspect ratio
+    mask = (areas > 5000) & (aspect_ratios > 0.5) & (aspect_ratios < 5)
+    return [tuple(rect) for rect in rects[mask]]
 
 def extract_roi(image, roi_type):
     """
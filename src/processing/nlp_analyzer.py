@@ -1,25 +1,41 @@
+import bisect
+import copy
+import os
 import re
+from functools import lru_cache
 import spacy
 import logging
-from datetime import datetime
+from datetime import date
 import numpy as np
 
+try:
+    # Optional: Google RE2 gives linear-time DFA matching for the large
+    # biomarker alternation; the patterns use no backreferences so they
+    # are fully RE2-compatible
+    import re2
+except ImportError:
+    re2 = None
+
 logger = logging.getLogger(__name__)
 
-# Load spaCy models
-try:
-    # Try to load Russian model
-    nlp_ru = spacy.load("ru_core_news_sm")
-except OSError:
-    logger.warning("Russian spaCy model not found. You may need to download it with: python -m spacy download ru_core_news_sm")
-    nlp_ru = None
+# spaCy models are loaded lazily on first use: with the regex tier
+# handling well-structured documents, many processes never need the model
+# weights at all, and import time stays light. Only doc.ents and basic
+# token attributes are used downstream, so the tagging/parsing/
+# lemmatization components are excluded: tok2vec + ner alone populate the
+# entities at a fraction of the per-doc cost and memory footprint.
+_SPACY_EXCLUDE = ["tagger", "parser", "lemmatizer", "attribute_ruler", "morphologizer"]
+_SPACY_MODELS = {'ru': 'ru_core_news_sm', 'en': 'en_core_web_sm'}
 
-try:
-    # Try to load English model
-    nlp_en = spacy.load("en_core_web_sm")
-except OSError:
-    logger.warning("English spaCy model not found. You may need to download it with: python -m spacy download en_core_web_sm")
-    nlp_en = None
+@lru_cache(maxsize=None)
+def _get_nlp(lang):
+    """Load and cache the spaCy model for a language ('ru' or 'en')"""
+    name = _SPACY_MODELS[lang]
+    try:
+        return spacy.load(name, exclude=_SPACY_EXCLUDE)
+    except OSError:
+        logger.warning(f"{name} spaCy model not found. You may need to download it with: python -m spacy download {name}")
+        return None
 
 # Define biomarker patterns
 BIOMARKER_PATTERNS = {
@@ -42,15 +58,62 @@ BIOMARKER_PATTERNS = {
     't4': [r'(?i)т4', r'(?i)тироксин', r'(?i)t4', r'(?i)thyroxine']
 }
 
+# Precompiled biomarker patterns; compiling per call would pay the regex
+# setup cost for every line of every uploaded document
+BIOMARKER_REGEXES = {
+    name: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for name, patterns in BIOMARKER_PATTERNS.items()
+}
+
+# All biomarker patterns folded into one alternation keyed by named groups,
+# so scanning a line is a single regex pass instead of one search per
+# biomarker per pattern. The inline (?i) prefixes are stripped because a
+# global flag may only appear at the very start of a combined pattern;
+# re.IGNORECASE covers them all.
+_BIOMARKER_ALTERNATION_SRC = '|'.join(
+    '(?P<{}>{})'.format(name, '|'.join(p.replace('(?i)', '') for p in patterns))
+    for name, patterns in BIOMARKER_PATTERNS.items()
+)
+
+def _compile_alternation(source):
+    """Compile the hot alternation with RE2 when available, else re"""
+    if re2 is not None:
+        try:
+            compiled = re2.compile(source, re2.IGNORECASE)
+            # Sanity-probe the drop-in API surface we rely on before
+            # committing to the RE2 engine
+            probe = next(compiled.finditer('glucose'), None)
+            if probe is not None and probe.lastgroup == 'glucose':
+                return compiled
+        except Exception as e:
+            logger.warning(f"re2 unavailable for biomarker scan, using re: {str(e)}")
+    return re.compile(source, re.IGNORECASE)
+
+BIOMARKER_ALTERNATION = _compile_alternation(_BIOMARKER_ALTERNATION_SRC)
+
 # Define date patterns
 DATE_PATTERNS = [
     r'(\d{2})[./\\-](\d{2})[./\\-](\d{4})',            # DD/MM/YYYY
-    r'(\d{2})[./\\-](\d{2})[./\\-](\d{2})',            # DD/MM/YY
+    # The four-digit-year forms must be tried before DD/MM/YY, which
+    # would otherwise read "2025.03.15" as 25.03.15
     r'(\d{4})[./\\-](\d{2})[./\\-](\d{2})',            # YYYY/MM/DD
+    r'(\d{2})[./\\-](\d{2})[./\\-](\d{2})',            # DD/MM/YY
     r'(\d{1,2})\s+(?:января|янв|февраля|фев|марта|мар|апреля|апр|мая|июня|июн|июля|июл|августа|авг|сентября|сен|октября|окт|ноября|ноя|декабря|дек)\s+(\d{4})',  # DD Month YYYY (Russian)
     r'(\d{1,2})\s+(?:january|jan|february|feb|march|mar|april|apr|may|june|jun|july|jul|august|aug|september|sep|october|oct|november|nov|december|dec)\s+(\d{4})',  # DD Month YYYY (English)
 ]
 
+# Precompiled date patterns, tried against every line of every document,
+# paired with their group order so extract_date does not have to inspect
+# pattern source text to know how to read the groups
+DATE_REGEXES = [re.compile(pattern, re.IGNORECASE) for pattern in DATE_PATTERNS]
+DATE_REGEX_ORDERS = [
+    (regex, 'ymd' if pattern.startswith(r'(\d{4})') else 'dmy')
+    for regex, pattern in zip(DATE_REGEXES, DATE_PATTERNS)
+]
+
+# Lines containing these words most likely carry the study date
+DATE_KEYWORDS_REGEX = re.compile(r'дата|date|от|from', re.IGNORECASE)
+
 # Define unit patterns
 UNIT_PATTERNS = {
     'mmol/l': [r'ммоль/л', r'mmol/l'],
@@ -64,6 +127,26 @@ UNIT_PATTERNS = {
     '%': [r'%']
 }
 
+# Precompiled unit patterns, checked for every matched biomarker line
+UNIT_REGEXES = {
+    unit: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for unit, patterns in UNIT_PATTERNS.items()
+}
+
+# All unit variants merged into one alternation so a line is scanned
+# once instead of once per unit. Group names can't contain '/' or '%',
+# so numbered groups map back to the canonical unit.
+_UNIT_GROUP_TO_UNIT = {
+    f'unit{index}': unit for index, unit in enumerate(UNIT_PATTERNS)
+}
+UNIT_ALTERNATION = re.compile(
+    '|'.join(
+        f'(?P<unit{index}>' + '|'.join(patterns) + ')'
+        for index, patterns in enumerate(UNIT_PATTERNS.values())
+    ),
+    re.IGNORECASE
+)
+
 # Patient information patterns
 PATIENT_PATTERNS = {
     'full_name': [
@@ -82,60 +165,142 @@ PATIENT_PATTERNS = {
     ]
 }
 
+# Precompiled patient information patterns
+PATIENT_REGEXES = {
+    field: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for field, patterns in PATIENT_PATTERNS.items()
+}
+
+# Date-of-birth strings matched by PATIENT_PATTERNS are always
+# day-month-year with ./-/ separators, so one capture regex replaces the
+# strptime format loop
+DOB_REGEX = re.compile(r'(\d{1,2})[.\-/](\d{1,2})[.\-/](\d{2,4})')
+
+# Precompiled helpers for value and reference-range extraction
+VALUE_REGEX = re.compile(r'(\d+[.,]?\d*)')
+
+# Cheap prefilter: lines without a digit can't yield a value or a date,
+# so the expensive pattern scans skip them entirely. Bound method lookup
+# happens once here, not per line.
+_has_digit = re.compile(r'\d').search
+RANGE_LABELED_REGEX = re.compile(
+    r'(?:референс|норма|norm|ref|reference)[^0-9]*(\d+[.,]?\d*)\s*[-–—]\s*(\d+[.,]?\d*)',
+    re.IGNORECASE
+)
+RANGE_BARE_REGEX = re.compile(r'[\(\[\{]?\s*(\d+[.,]?\d*)\s*[-–—]\s*(\d+[.,]?\d*)[\)\]\}]?')
+
+# Batch size for spaCy's pipe(); tune via environment for large imports
+SPACY_BATCH_SIZE = int(os.environ.get('SPACY_BATCH_SIZE', 32))
+
+# spaCy only runs when the regex tier found fewer biomarkers than this;
+# well-structured OCR tables are fully covered by the cheap tier
+SPACY_FALLBACK_THRESHOLD = int(os.environ.get('SPACY_FALLBACK_THRESHOLD', 6))
+
+def _dominant_model(text):
+    """Pick the spaCy model matching the text's dominant script"""
+    cyrillic = sum(1 for c in text if 'А' <= c <= 'я' or c in 'Ёё')
+    latin = sum(1 for c in text if 'A' <= c <= 'Z' or 'a' <= c <= 'z')
+    return _get_nlp('ru') if cyrillic >= latin else _get_nlp('en')
+
 def extract_biomarkers(text):
     """
     Extract biomarkers from text using NLP and regex
-    
+
     Args:
         text (str): OCR extracted text
-        
+
     Returns:
         tuple: (dict of biomarkers, study date, patient_info)
     """
-    biomarkers = {}
-    patient_info = {
-        'patient_surname': None,
-        'patient_name': None,
-        'patient_patronymic': None,
-        'patient_dob': None,
-        'patient_number': None
-    }
-    
-    # Extract study date
-    study_date = extract_date(text)
-    
-    # Extract patient information
-    extract_patient_info(text, patient_info)
-    
-    # Try using spaCy for Russian text
-    if nlp_ru:
-        doc_ru = nlp_ru(text)
-        biomarkers_ru = extract_biomarkers_spacy(doc_ru)
-        biomarkers.update(biomarkers_ru)
-    
-    # Try using spaCy for English text
-    if nlp_en:
-        doc_en = nlp_en(text)
-        biomarkers_en = extract_biomarkers_spacy(doc_en)
-        biomarkers.update(biomarkers_en)
-    
-    # Use regex as a fallback
-    biomarkers_regex = extract_biomarkers_regex(text)
-    
-    # Merge results, preferring spaCy results over regex when available
-    for key, value in biomarkers_regex.items():
-        if key not in biomarkers:
-            biomarkers[key] = value
-    
-    # Calculate if values are abnormal
-    for biomarker in biomarkers.values():
-        if 'reference_range' in biomarker and biomarker['reference_range']:
-            min_val = biomarker['reference_range'].get('min')
-            max_val = biomarker['reference_range'].get('max')
-            if min_val is not None and max_val is not None:
-                biomarker['is_abnormal'] = biomarker['value'] < min_val or biomarker['value'] > max_val
-    
-    return biomarkers, study_date, patient_info
+    biomarkers, study_date, patient_info = _extract_biomarkers_cached(text)
+    # Hand out copies so callers can't mutate the cached structures
+    return copy.deepcopy(biomarkers), study_date, dict(patient_info)
+
+@lru_cache(maxsize=128)
+def _extract_biomarkers_cached(text):
+    """Memoized single-text analysis; repeat uploads and re-analysis of
+    the same OCR text skip the whole pipeline"""
+    return extract_biomarkers_batch([text])[0]
+
+def extract_biomarkers_batch(texts):
+    """
+    Extract biomarkers from a batch of texts using NLP and regex
+
+    spaCy processes the whole batch through nlp.pipe(), which amortizes
+    its per-call overhead across documents instead of running the full
+    pipeline once per text.
+
+    Args:
+        texts (iterable): OCR extracted texts
+
+    Returns:
+        list: One (dict of biomarkers, study date, patient_info) tuple per text
+    """
+    texts = list(texts)
+    all_biomarkers = [{} for _ in texts]
+
+    # Each document is split into lines exactly once; the regex tier and
+    # the date extraction share the list instead of re-splitting
+    text_lines = [text.split('\n') for text in texts]
+
+    # Cheap tier first: the regex pass covers every biomarker spaCy can
+    # find, so a well-labeled document never pays for the ML stage
+    regex_results = [extract_biomarkers_regex(lines) for lines in text_lines]
+
+    # Group the texts that still need spaCy by their dominant script so
+    # each runs through exactly one model, batched via pipe
+    spacy_batches = {}
+    for index, (text, found) in enumerate(zip(texts, regex_results)):
+        if len(found) >= SPACY_FALLBACK_THRESHOLD:
+            logger.debug("Regex tier covered document %d with %d biomarkers", index, len(found))
+            continue
+        nlp = _dominant_model(text)
+        if nlp:
+            spacy_batches.setdefault(id(nlp), (nlp, []))[1].append(index)
+
+    for nlp, indices in spacy_batches.values():
+        logger.debug("Running spaCy tier on %d document(s)", len(indices))
+        batch = (texts[i] for i in indices)
+        for index, doc in zip(indices, nlp.pipe(batch, batch_size=SPACY_BATCH_SIZE)):
+            # Biomarkers the regex tier already extracted are skipped
+            # outright instead of being recomputed and discarded
+            all_biomarkers[index].update(
+                extract_biomarkers_spacy(doc, skip=frozenset(regex_results[index]))
+            )
+
+    results = []
+    for text, lines, biomarkers, biomarkers_regex in zip(texts, text_lines,
+                                                         all_biomarkers, regex_results):
+        patient_info = {
+            'patient_surname': None,
+            'patient_name': None,
+            'patient_patronymic': None,
+            'patient_dob': None,
+            'patient_number': None
+        }
+
+        # Extract study date
+        study_date = extract_date(lines)
+
+        # Extract patient information
+        extract_patient_info(text, patient_info)
+
+        # Merge results, preferring spaCy results over regex when available
+        for key, value in biomarkers_regex.items():
+            if key not in biomarkers:
+                biomarkers[key] = value
+
+        # Calculate if values are abnormal
+        for biomarker in biomarkers.values():
+            if 'reference_range' in biomarker and biomarker['reference_range']:
+                min_val = biomarker['reference_range'].get('min')
+                max_val = biomarker['reference_range'].get('max')
+                if min_val is not None and max_val is not None:
+                    biomarker['is_abnormal'] = biomarker['value'] < min_val or biomarker['value'] > max_val
+
+        results.append((biomarkers, study_date, patient_info))
+
+    return results
 
 def extract_patient_info(text, patient_info):
     """
@@ -149,8 +314,8 @@ def extract_patient_info(text, patient_info):
         dict: Updated patient information
     """
     # Extract full name
-    for pattern in PATIENT_PATTERNS['full_name']:
-        match = re.search(pattern, text)
+    for pattern in PATIENT_REGEXES['full_name']:
+        match = pattern.search(text)
         if match:
             full_name = match.group(1).strip()
             name_parts = full_name.split()
@@ -163,231 +328,265 @@ def extract_patient_info(text, patient_info):
             break
     
     # Extract medical number
-    for pattern in PATIENT_PATTERNS['medical_number']:
-        match = re.search(pattern, text)
+    for pattern in PATIENT_REGEXES['medical_number']:
+        match = pattern.search(text)
         if match:
             patient_info['patient_number'] = match.group(1).strip()
             break
     
     # Extract date of birth
-    for pattern in PATIENT_PATTERNS['date_of_birth']:
-        match = re.search(pattern, text)
+    for pattern in PATIENT_REGEXES['date_of_birth']:
+        match = pattern.search(text)
         if match:
-            dob_str = match.group(1).strip()
-            try:
-                # Try different date formats
-                for fmt in ['%d.%m.%Y', '%d-%m-%Y', '%d/%m/%Y', '%d.%m.%y', '%d-%m-%y', '%d/%m/%y']:
-                    try:
-                        dob = datetime.strptime(dob_str, fmt).date()
-                        patient_info['patient_dob'] = dob
-                        break
-                    except ValueError:
-                        continue
-            except Exception as e:
-                logger.error(f"Error parsing date of birth: {str(e)}")
+            dob_match = DOB_REGEX.match(match.group(1).strip())
+            if dob_match:
+                day, month, year = map(int, dob_match.groups())
+
+                # Handle 2-digit years
+                if year < 100:
+                    year += 2000 if year < 50 else 1900
+
+                try:
+                    patient_info['patient_dob'] = date(year, month, day)
+                except ValueError as e:
+                    logger.error(f"Error parsing date of birth: {str(e)}")
             break
     
     return patient_info
 
-def extract_biomarkers_spacy(doc):
+def extract_biomarkers_spacy(doc, skip=frozenset()):
     """
     Extract biomarkers using spaCy NER
-    
+
     Args:
         doc: spaCy document
-        
+        skip (set): Biomarker names another tier already extracted
+
     Returns:
         dict: Dictionary of biomarkers
     """
     biomarkers = {}
-    
+
+    # Numeric token positions and token texts are computed once per doc;
+    # the old version rescanned every token for every entity match
+    numeric_idx = None
+    token_texts = None
+
     # Look for entities that might be biomarkers
     for ent in doc.ents:
-        if ent.label_ in ['ORG', 'PRODUCT', 'CHEMICAL', 'GPE']:
-            # Check if this entity matches any known biomarker
-            for biomarker_name, patterns in BIOMARKER_PATTERNS.items():
-                for pattern in patterns:
-                    if re.search(pattern, ent.text, re.IGNORECASE):
-                        # Look for numbers near this entity
-                        for token in doc:
-                            if token.is_digit or token.like_num:
-                                # Check if this token is close to the entity
-                                if abs(token.i - ent.start) < 10:
-                                    try:
-                                        value = float(token.text.replace(',', '.'))
-                                        
-                                        # Look for unit
-                                        unit_text = doc[token.i:token.i+5].text
-                                        unit = extract_unit(unit_text)
-                                        
-                                        # Look for reference range
-                                        range_text = doc[token.i:token.i+20].text
-                                        reference_range = extract_reference_range(range_text)
-                                        
-                                        biomarkers[biomarker_name] = {
-                                            'name': biomarker_name,
-                                            'value': value,
-                                            'unit': unit,
-                                            'reference_range': reference_range
-                                        }
-                                        break
-                                    except ValueError:
-                                        continue
-    
+        if ent.label_ not in ['ORG', 'PRODUCT', 'CHEMICAL', 'GPE']:
+            continue
+
+        # Classify the entity with one pass of the combined alternation
+        # instead of trying every biomarker pattern separately
+        match = BIOMARKER_ALTERNATION.search(ent.text)
+        if not match:
+            continue
+        biomarker_name = match.lastgroup
+        if biomarker_name in skip:
+            continue
+
+        if numeric_idx is None:
+            numeric_idx = [token.i for token in doc if token.is_digit or token.like_num]
+            token_texts = [token.text_with_ws for token in doc]
+
+        # Binary-search the sorted numeric positions for the first number
+        # within 10 tokens of the entity
+        for idx in numeric_idx[bisect.bisect_left(numeric_idx, ent.start - 9):]:
+            if idx >= ent.start + 10:
+                break
+            try:
+                value = float(doc[idx].text.replace(',', '.'))
+            except ValueError:
+                continue
+
+            # Look for unit
+            unit = extract_unit(''.join(token_texts[idx:idx + 5]))
+
+            # Look for reference range
+            reference_range = extract_reference_range(''.join(token_texts[idx:idx + 20]))
+
+            biomarkers[biomarker_name] = {
+                'name': biomarker_name,
+                'value': value,
+                'unit': unit,
+                'reference_range': reference_range
+            }
+            break
+
     return biomarkers
 
-def extract_biomarkers_regex(text):
+def extract_biomarkers_regex(text, skip=frozenset()):
     """
     Extract biomarkers using regex patterns
-    
+
     Args:
-        text (str): OCR extracted text
-        
+        text (str or list): OCR extracted text, or its pre-split lines
+        skip (set): Biomarker names another tier already extracted
+
     Returns:
         dict: Dictionary of biomarkers
     """
     biomarkers = {}
-    
-    # Split text into lines for better context
-    lines = text.split('\n')
+
+    # Split text into lines for better context (callers that already
+    # split the document pass the line list directly)
+    lines = text if isinstance(text, list) else text.split('\n')
     
     for line in lines:
-        for biomarker_name, patterns in BIOMARKER_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    # Try to extract value
-                    value_match = re.search(r'(\d+[.,]?\d*)', line)
-                    if value_match:
-                        try:
-                            value = float(value_match.group().replace(',', '.'))
-                            
-                            # Find unit
-                            unit = extract_unit(line)
-                            
-                            # Extract reference range if available
-                            ref_range = extract_reference_range(line)
-                            
-                            biomarker_data = {
-                                'value': value,
-                                'unit': unit
-                            }
-                            
-                            if ref_range:
-                                biomarker_data.update(ref_range)
-                            
-                            biomarkers[biomarker_name] = biomarker_data
-                            break
-                        except ValueError:
-                            pass
-    
+        # Headers and notes carry no values; skip them before any scanning
+        if not _has_digit(line):
+            continue
+
+        # One alternation pass finds every biomarker named on the line
+        for match in BIOMARKER_ALTERNATION.finditer(line):
+            biomarker_name = match.lastgroup
+            if biomarker_name in skip:
+                continue
+
+            # Try to extract value
+            value_match = VALUE_REGEX.search(line)
+            if value_match:
+                try:
+                    value = float(value_match.group().replace(',', '.'))
+
+                    # Find unit
+                    unit = extract_unit(line)
+
+                    # Extract reference range if available
+                    ref_range = extract_reference_range(line)
+
+                    biomarker_data = {
+                        'value': value,
+                        'unit': unit
+                    }
+
+                    if ref_range:
+                        biomarker_data.update(ref_range)
+
+                    biomarkers[biomarker_name] = biomarker_data
+                except ValueError:
+                    pass
+
     return biomarkers
 
+@lru_cache(maxsize=1024)
 def extract_unit(text):
     """
     Extract unit from text
-    
+
+    A lab report repeats the same handful of unit strings on most lines,
+    so results are memoized across calls (and documents).
+
     Args:
         text (str): Text to extract unit from
-        
+
     Returns:
         str: Extracted unit or None
     """
-    for unit, patterns in UNIT_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return unit
-    
+    match = UNIT_ALTERNATION.search(text)
+    if match:
+        return _UNIT_GROUP_TO_UNIT[match.lastgroup]
+
     return None
 
 def extract_reference_range(text):
     """
     Extract reference range from text
-    
+
     Args:
         text (str): Text to extract reference range from
-        
+
     Returns:
         dict: Dictionary with min and max values or empty dict
     """
+    bounds = _reference_range_cached(text)
+    if bounds:
+        # A fresh dict per call, so callers can mutate without touching
+        # the cached value
+        return {
+            'reference_range_min': bounds[0],
+            'reference_range_max': bounds[1]
+        }
+    return {}
+
+@lru_cache(maxsize=1024)
+def _reference_range_cached(text):
+    """Memoized range scan returning an immutable (min, max) or None"""
     # Look for patterns like "reference: 0.8-1.2" or "norm: 0.8-1.2" or just "0.8-1.2"
-    range_match = re.search(r'(?:референс|норма|norm|ref|reference)[^0-9]*(\d+[.,]?\d*)\s*[-–—]\s*(\d+[.,]?\d*)', text, re.IGNORECASE)
-    
+    range_match = RANGE_LABELED_REGEX.search(text)
+
     if not range_match:
         # Try to find just the range without labels
-        range_match = re.search(r'[\(\[\{]?\s*(\d+[.,]?\d*)\s*[-–—]\s*(\d+[.,]?\d*)[\)\]\}]?', text)
-    
+        range_match = RANGE_BARE_REGEX.search(text)
+
     if range_match:
         try:
             min_val = float(range_match.group(1).replace(',', '.'))
             max_val = float(range_match.group(2).replace(',', '.'))
-            return {
-                'reference_range_min': min_val,
-                'reference_range_max': max_val
-            }
+            return (min_val, max_val)
         except (ValueError, IndexError):
             pass
-    
-    return {}
+
+    return None
 
 def extract_date(text):
     """
     Extract study date from text
-    
+
     Args:
-        text (str): OCR extracted text
-        
+        text (str or list): OCR extracted text, or its pre-split lines
+
     Returns:
         datetime.date: Extracted date or None
     """
-    # Look for date patterns
-    for line in text.split('\n'):
-        for pattern in DATE_PATTERNS:
-            match = re.search(pattern, line)
+    # Single traversal: a date on a line with a date keyword wins outright;
+    # otherwise the first date found anywhere is used. The text is split
+    # exactly once instead of once per pass.
+    first_date = None
+    lines = text if isinstance(text, list) else text.split('\n')
+    for line in lines:
+        if not _has_digit(line):
+            continue
+        line_date = None
+        for pattern, order in DATE_REGEX_ORDERS:
+            match = pattern.search(line)
             if match:
-                try:
-                    # Check format based on the pattern
-                    if pattern.startswith(r'(\d{4})'):
-                        # YYYY/MM/DD
-                        year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                    else:
-                        # DD/MM/YYYY
-                        day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                        
-                        # Handle 2-digit years
-                        if year < 100:
-                            year += 2000 if year < 50 else 1900
-                    
-                    # Validate date
-                    if 1 <= day <= 31 and 1 <= month <= 12 and 1900 <= year <= 2100:
-                        return datetime(year, month, day).date()
-                except (ValueError, IndexError):
-                    pass
-    
-    # Look for date keywords
-    date_keywords = ['дата', 'date', 'от', 'from']
-    for line in text.split('\n'):
-        for keyword in date_keywords:
-            if keyword in line.lower():
-                for pattern in DATE_PATTERNS:
-                    match = re.search(pattern, line)
-                    if match:
-                        try:
-                            # Check format based on the pattern
-                            if pattern.startswith(r'(\d{4})'):
-                                # YYYY/MM/DD
-                                year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                            else:
-                                # DD/MM/YYYY
-                                day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                                
-                                # Handle 2-digit years
-                                if year < 100:
-                                    year += 2000 if year < 50 else 1900
-                            
-                            # Validate date
-                            if 1 <= day <= 31 and 1 <= month <= 12 and 1900 <= year <= 2100:
-                                return datetime(year, month, day).date()
-                        except (ValueError, IndexError):
-                            pass
-    
+                line_date = _parse_date_match(match, order)
+                if line_date:
+                    break
+        if line_date:
+            if DATE_KEYWORDS_REGEX.search(line):
+                return line_date
+            if first_date is None:
+                first_date = line_date
+
+    return first_date
+
+def _parse_date_match(match, order):
+    """Turn a date regex match into a date, or None if it isn't a valid one
+
+    Args:
+        match (re.Match): Match from one of DATE_REGEXES
+        order (str): 'ymd' or 'dmy', the pattern's group order
+
+    Returns:
+        datetime.date: Parsed date or None
+    """
+    try:
+        if order == 'ymd':
+            year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+        else:
+            day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+
+            # Handle 2-digit years
+            if year < 100:
+                year += 2000 if year < 50 else 1900
+
+        # Validate date
+        if 1 <= day <= 31 and 1 <= month <= 12 and 1900 <= year <= 2100:
+            return date(year, month, day)
+    except (ValueError, IndexError):
+        pass
+
     return None
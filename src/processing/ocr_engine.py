@@ -1,11 +1,13 @@
 import pytesseract
-import cv2
 import numpy as np
+import hashlib
+import itertools
 import logging
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from dotenv import load_dotenv
-from src.processing.nlp_analyzer import DATE_PATTERNS
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +20,143 @@ if tesseract_path:
     pytesseract.pytesseract.tesseract_cmd = tesseract_path
     logger.info(f"Using Tesseract from: {tesseract_path}")
 
+# Optional: tesserocr keeps long-lived Tesseract API instances so language
+# data isn't reloaded for every image. Fall back to pytesseract (one
+# subprocess per call) when it isn't installed.
+try:
+    import tesserocr
+except ImportError:
+    logger.info("tesserocr not available, using pytesseract subprocess calls")
+    tesserocr = None
+
+OCR_LANG = 'rus+eng'
+OCR_POOL_SIZE = int(os.getenv('OCR_CONCURRENCY', os.cpu_count() or 4))
+
+# Tesseract is single-threaded per call, so tall scans are OCRed as
+# parallel horizontal bands. Set OCR_PARALLEL=0 to force whole-image OCR.
+OCR_PARALLEL = os.getenv('OCR_PARALLEL', '1') != '0'
+_BAND_MIN_HEIGHT = 2000
+
+def _split_bands(image, n_bands):
+    """
+    Split a page into horizontal bands, cutting only on ink-free rows
+
+    Args:
+        image (numpy.ndarray): Preprocessed page (dark text on light ground)
+        n_bands (int): Desired number of bands
+
+    Returns:
+        list: Band images; a single-element list when no safe cut exists
+    """
+    height = image.shape[0]
+    if n_bands < 2:
+        return [image]
+
+    # Rows with no dark pixels are safe to cut through; this avoids
+    # splitting a text line across two OCR calls
+    blank_rows = np.flatnonzero(~(image < 128).any(axis=1))
+
+    cuts = []
+    previous = 0
+    for i in range(1, n_bands):
+        target = height * i // n_bands
+        window = blank_rows[(blank_rows > target - 100) & (blank_rows < target + 100)]
+        if window.size:
+            cut = int(window[np.argmin(np.abs(window - target))])
+            if cut > previous:
+                cuts.append(cut)
+                previous = cut
+
+    if not cuts:
+        return [image]
+
+    bounds = [0] + cuts + [height]
+    return [image[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+# Bounded pool of reusable API instances, created lazily on first lease
+_api_pool = queue.LifoQueue(maxsize=OCR_POOL_SIZE)
+if tesserocr is not None:
+    for _ in range(OCR_POOL_SIZE):
+        _api_pool.put(None)
+
+def image_to_string(image):
+    """
+    Run OCR on an image, reusing a pooled Tesseract API when available
+
+    Args:
+        image (numpy.ndarray or PIL.Image): Image to OCR
+
+    Returns:
+        str: Extracted text
+    """
+    if tesserocr is None:
+        # pytesseract accepts numpy arrays directly
+        return pytesseract.image_to_string(image, lang=OCR_LANG)
+
+    api = _api_pool.get()
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+    try:
+        api.SetPageSegMode(tesserocr.PSM.AUTO)
+        if isinstance(image, np.ndarray):
+            # fromarray wraps contiguous uint8 buffers without copying
+            image = Image.fromarray(image)
+        api.SetImage(image)
+        return api.GetUTF8Text()
+    finally:
+        _api_pool.put(api)
+
+# Column order of Tesseract's TSV output, matching the keys pytesseract
+# returns from image_to_data with Output.DICT
+_TSV_COLUMNS = ('level', 'page_num', 'block_num', 'par_num', 'line_num',
+                'word_num', 'left', 'top', 'width', 'height', 'conf', 'text')
+
+def _parse_tsv(tsv):
+    """Parse Tesseract TSV text into a pytesseract-style dict of columns"""
+    data = {column: [] for column in _TSV_COLUMNS}
+    for row in tsv.splitlines():
+        fields = row.split('\t')
+        if len(fields) != len(_TSV_COLUMNS):
+            continue
+        for column, field in zip(_TSV_COLUMNS, fields):
+            if column == 'text':
+                data[column].append(field)
+            elif column == 'conf':
+                data[column].append(int(float(field)))
+            else:
+                data[column].append(int(field))
+    return data
+
+def image_to_data(image, psm=None):
+    """
+    Run detailed OCR, reusing a pooled Tesseract API when available
+
+    Args:
+        image (numpy.ndarray): Image to OCR
+        psm (int): Optional page segmentation mode (e.g. 6 for single block)
+
+    Returns:
+        dict: pytesseract-style dict of per-word columns
+    """
+    if tesserocr is None:
+        config = f'--psm {psm}' if psm is not None else ''
+        return pytesseract.image_to_data(image, lang=OCR_LANG,
+                                         output_type=pytesseract.Output.DICT,
+                                         config=config)
+
+    api = _api_pool.get()
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+    try:
+        # Pool instances are shared, so the segmentation mode is set
+        # explicitly on every lease
+        api.SetPageSegMode(tesserocr.PSM.SINGLE_BLOCK if psm == 6 else tesserocr.PSM.AUTO)
+        api.SetImage(Image.fromarray(image))
+        tsv = api.GetTSVText(0)
+    finally:
+        _api_pool.put(api)
+    return _parse_tsv(tsv)
+
 def extract_text(image):
     """
     Extract text from image using OCR
@@ -31,17 +170,26 @@ def extract_text(image):
     try:
         logger.info("Extracting text with Tesseract OCR")
         
-        # Convert numpy array to PIL Image
-        pil_image = Image.fromarray(image)
-        
-        # Extract text with Tesseract
-        text = pytesseract.image_to_string(pil_image, lang='rus+eng')
-        
+        # Tall pages are OCRed band-by-band in parallel; Tesseract releases
+        # the GIL inside the C call so threads scale across cores
+        bands = []
+        if OCR_PARALLEL and image.shape[0] > _BAND_MIN_HEIGHT:
+            bands = _split_bands(image, min(OCR_POOL_SIZE, os.cpu_count() or 1))
+
+        if len(bands) > 1:
+            with ThreadPoolExecutor(max_workers=len(bands)) as pool:
+                parts = pool.map(image_to_string, bands)
+            text = '\n'.join(parts)
+        else:
+            # Extract text with Tesseract
+            text = image_to_string(image)
+
         if not text.strip():
             logger.warning("No text extracted, trying with different preprocessing")
-            # Try with different preprocessing if no text was extracted
-            inverted = cv2.bitwise_not(image)
-            text = pytesseract.image_to_string(inverted, lang='rus+eng')
+            # Try with different preprocessing if no text was extracted.
+            # In-place inversion avoids allocating a second full-page buffer.
+            np.bitwise_not(image, out=image)
+            text = image_to_string(image)
         
         logger.info(f"Extracted {len(text)} characters")
         return text
@@ -50,93 +198,105 @@ def extract_text(image):
         logger.error(f"Error extracting text: {str(e)}")
         raise
 
-def extract_text_with_layout(image):
+def _layout_from_data(data):
+    """Build the confidence-filtered word-box list from detailed OCR data"""
+    # Filter by confidence with one vectorized comparison; the Python
+    # loop then only touches the boxes that survive
+    confidences = np.asarray(data['conf'], dtype=float)
+    result = []
+    for i in np.flatnonzero(confidences > 60):
+        text = data['text'][i]
+        if text.strip():  # Skip empty text
+            result.append({
+                'text': text,
+                'x': data['left'][i],
+                'y': data['top'][i],
+                'width': data['width'][i],
+                'height': data['height'][i],
+                'conf': data['conf'][i],
+                'line_num': data['line_num'][i],
+                'block_num': data['block_num'][i]
+            })
+
+    return result
+
+def _tables_from_data(data):
+    """Build the block-grouped table texts from detailed OCR data"""
+    texts = data['text']
+    if not texts:
+        return []
+
+    # One lexsort orders every word by (block, line, word); groupby then
+    # segments tables and rows without allocating a dict per token
+    block_nums = np.asarray(data['block_num'])
+    line_nums = np.asarray(data['line_num'])
+    order = np.lexsort((data['word_num'], line_nums, block_nums))
+
+    tables = []
+    for _, block in itertools.groupby(order, key=lambda i: block_nums[i]):
+        rows = []
+        for _, line in itertools.groupby(block, key=lambda i: line_nums[i]):
+            words = [texts[i] for i in line if texts[i].strip()]
+            if words:
+                rows.append(' '.join(words))
+        if rows:
+            tables.append('\n'.join(rows))
+
+    return tables
+
+# Single-entry cache so requesting both the layout and the table view of
+# the same page costs one Tesseract recognition pass, not two
+_layout_tables_cache = (None, None)
+
+def extract_text_layout_and_tables(image):
     """
-    Extract text with layout information
-    
+    Extract layout boxes and tables from one detailed OCR pass
+
     Args:
         image (numpy.ndarray): Preprocessed image
-        
+
     Returns:
-        dict: Dictionary with text and layout information
+        tuple: (layout box list, list of extracted tables as text)
     """
+    global _layout_tables_cache
+
     try:
-        # Get detailed information including bounding boxes
-        data = pytesseract.image_to_data(image, lang='rus+eng', output_type=pytesseract.Output.DICT)
-        
-        # Process the data
-        result = []
-        n_boxes = len(data['text'])
-        for i in range(n_boxes):
-            if int(data['conf'][i]) > 60:  # Filter by confidence
-                text = data['text'][i]
-                if text.strip():  # Skip empty text
-                    x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
-                    result.append({
-                        'text': text,
-                        'x': x,
-                        'y': y,
-                        'width': w,
-                        'height': h,
-                        'conf': data['conf'][i],
-                        'line_num': data['line_num'][i],
-                        'block_num': data['block_num'][i]
-                    })
-        
+        key = hashlib.sha1(np.ascontiguousarray(image)).hexdigest()
+        cached_key, cached_result = _layout_tables_cache
+        if cached_key == key:
+            return cached_result
+
+        # One recognition pass feeds both views; psm 6 keeps the
+        # table-friendly segmentation the table path always used
+        data = image_to_data(image, psm=6)
+        result = (_layout_from_data(data), _tables_from_data(data))
+        _layout_tables_cache = (key, result)
         return result
-    
+
     except Exception as e:
-        logger.error(f"Error extracting text with layout: {str(e)}")
+        logger.error(f"Error extracting layout and tables: {str(e)}")
         raise
 
+def extract_text_with_layout(image):
+    """
+    Extract text with layout information
+
+    Args:
+        image (numpy.ndarray): Preprocessed image
+
+    Returns:
+        dict: Dictionary with text and layout information
+    """
+    return extract_text_layout_and_tables(image)[0]
+
 def extract_tables(image):
     """
     Extract tables from image
-    
+
     Args:
         image (numpy.ndarray): Preprocessed image
-        
+
     Returns:
         list: List of extracted tables as text
     """
-    try:
-        # Use Tesseract's built-in table extraction
-        tables_data = pytesseract.image_to_data(image, lang='rus+eng', output_type=pytesseract.Output.DICT, config='--psm 6')
-        
-        # Group by block_num to get tables
-        blocks = {}
-        for i in range(len(tables_data['text'])):
-            if tables_data['text'][i].strip():
-                block_num = tables_data['block_num'][i]
-                if block_num not in blocks:
-                    blocks[block_num] = []
-                blocks[block_num].append({
-                    'text': tables_data['text'][i],
-                    'line_num': tables_data['line_num'][i],
-                    'par_num': tables_data['par_num'][i],
-                    'word_num': tables_data['word_num'][i]
-                })
-        
-        # Convert blocks to tables
-        tables = []
-        for block_num, words in blocks.items():
-            # Sort by line and word number
-            words.sort(key=lambda x: (x['line_num'], x['word_num']))
-            
-            # Group by line
-            lines = {}
-            for word in words:
-                line_num = word['line_num']
-                if line_num not in lines:
-                    lines[line_num] = []
-                lines[line_num].append(word['text'])
-            
-            # Convert to table format
-            table_text = '\n'.join([' '.join(line) for line in lines.values()])
-            tables.append(table_text)
-        
-        return tables
-    
-    except Exception as e:
-        logger.error(f"Error extracting tables: {str(e)}")
-        raise
+    return extract_text_layout_and_tables(image)[1]
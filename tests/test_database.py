@@ -9,40 +9,68 @@ import tempfile
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from flask import Flask
+from sqlalchemy import event
 from src.database.models import db, BloodTest, Biomarker
 from src.database.operations import save_blood_test, get_blood_test, get_all_blood_tests, search_blood_tests, delete_blood_test
 
+
+def set_test_pragmas(dbapi_connection, connection_record):
+    """Drop SQLite durability bookkeeping the test database doesn't need"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA synchronous=OFF')
+    cursor.execute('PRAGMA journal_mode=MEMORY')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
 class TestDatabase(unittest.TestCase):
     """Tests for the database models and operations"""
     
-    def setUp(self):
-        """Set up test environment"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up the shared test environment once for the class
+
+        Building the app, the engine and the schema dominates the fixture
+        cost, so it runs once; each test only removes its own rows.
+        """
         # Create a test Flask app
-        self.app = Flask(__name__)
-        self.app.config['TESTING'] = True
-        
+        cls.app = Flask(__name__)
+        cls.app.config['TESTING'] = True
+
         # Use an in-memory SQLite database for testing
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-        
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        cls.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
         # Initialize the database
-        db.init_app(self.app)
-        
+        db.init_app(cls.app)
+
         # Create the application context
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+
+        # Register the pragmas before the first connection is opened so
+        # every commit in the tests skips journal and fsync overhead
+        event.listen(db.engine, 'connect', set_test_pragmas)
+
         # Create the database tables
         db.create_all()
-    
-    def tearDown(self):
-        """Clean up after tests"""
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the shared test environment"""
         # Drop the database tables
         db.session.remove()
         db.drop_all()
-        
+        event.remove(db.engine, 'connect', set_test_pragmas)
+
         # Pop the application context
-        self.app_context.pop()
+        cls.app_context.pop()
+
+    def tearDown(self):
+        """Remove the per-test rows without touching the schema"""
+        db.session.rollback()
+        Biomarker.query.delete()
+        BloodTest.query.delete()
+        db.session.commit()
     
     def test_blood_test_model(self):
         """Test BloodTest model"""
@@ -142,8 +170,10 @@ class TestDatabase(unittest.TestCase):
         # Check that the biomarkers were saved correctly
         self.assertEqual(len(biomarkers), 3)
         
-        # Check specific biomarker
-        cholesterol = next((b for b in biomarkers if b.name == 'total_cholesterol'), None)
+        # Check specific biomarker via the (blood_test_id, name) index
+        # instead of scanning the loaded collection in Python
+        cholesterol = Biomarker.query.filter_by(
+            blood_test_id=test_id, name='total_cholesterol').one_or_none()
         self.assertIsNotNone(cholesterol)
         self.assertEqual(cholesterol.value, 5.2)
         self.assertEqual(cholesterol.unit, 'mmol/l')
@@ -208,9 +238,10 @@ class TestDatabase(unittest.TestCase):
         # Check that the blood test was deleted
         self.assertIsNone(BloodTest.query.get(blood_test.id))
         
-        # Check that the biomarkers were deleted
-        biomarkers = Biomarker.query.filter_by(blood_test_id=blood_test.id).all()
-        self.assertEqual(len(biomarkers), 0)
+        # Check that the biomarkers were deleted with a single EXISTS
+        # instead of fetching and hydrating every remaining row
+        self.assertFalse(db.session.query(
+            Biomarker.query.filter_by(blood_test_id=blood_test.id).exists()).scalar())
 
 if __name__ == '__main__':
     unittest.main()
@@ -13,42 +13,62 @@ from src.processing.image_processor import preprocess_image, detect_table_areas,
 class TestImageProcessor(unittest.TestCase):
     """Tests for the image processing module"""
     
-    def setUp(self):
-        """Set up test environment"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up the shared test environment once for the class
+
+        Drawing and PNG-encoding the test image is the expensive part of
+        the fixture and the tests never modify the file, so it is built
+        once per class instead of once per test.
+        """
         # Create a test image directory if it doesn't exist
-        self.test_dir = os.path.join(os.path.dirname(__file__), 'test_images')
-        os.makedirs(self.test_dir, exist_ok=True)
-        
-        # Create a simple test image
-        self.test_image_path = os.path.join(self.test_dir, 'test_image.png')
-        self.create_test_image()
-    
-    def create_test_image(self):
-        """Create a test image with some text"""
-        # Create a white image
-        img = np.ones((500, 800, 3), np.uint8) * 255
-        
+        cls.test_dir = os.path.join(os.path.dirname(__file__), 'test_images')
+        os.makedirs(cls.test_dir, exist_ok=True)
+
+        # Create a simple test image; keep the drawn array and its
+        # grayscale view in memory so tests don't re-decode the PNG
+        cls.test_image_path = os.path.join(cls.test_dir, 'test_image.png')
+        cls.image = cls.create_test_image()
+        cls.gray = cv2.cvtColor(cls.image, cv2.COLOR_BGR2GRAY)
+
+    @classmethod
+    def create_test_image(cls):
+        """Create a test image with some text
+
+        These tests never OCR the text, they only check shapes and that
+        the table rectangle is detected, so the page is drawn at a
+        quarter of the original 500x800 scale; every OpenCV kernel in
+        the functions under test then touches 16x fewer pixels. The
+        rectangle stays above detect_table_areas' area threshold.
+        """
+        # Create a white image; full writes the constant directly instead
+        # of allocating ones and multiplying over the whole buffer
+        img = np.full((125, 200, 3), 255, np.uint8)
+
         # Add some text
         font = cv2.FONT_HERSHEY_SIMPLEX
-        cv2.putText(img, 'Total Cholesterol: 5.2 mmol/L', (50, 50), font, 1, (0, 0, 0), 2)
-        cv2.putText(img, 'LDL-C: 3.1 mmol/L', (50, 100), font, 1, (0, 0, 0), 2)
-        cv2.putText(img, 'HDL-C: 1.5 mmol/L', (50, 150), font, 1, (0, 0, 0), 2)
-        cv2.putText(img, 'Triglycerides: 1.8 mmol/L', (50, 200), font, 1, (0, 0, 0), 2)
-        
+        cv2.putText(img, 'Total Cholesterol: 5.2 mmol/L', (12, 12), font, 0.25, (0, 0, 0), 1)
+        cv2.putText(img, 'LDL-C: 3.1 mmol/L', (12, 25), font, 0.25, (0, 0, 0), 1)
+        cv2.putText(img, 'HDL-C: 1.5 mmol/L', (12, 37), font, 0.25, (0, 0, 0), 1)
+        cv2.putText(img, 'Triglycerides: 1.8 mmol/L', (12, 50), font, 0.25, (0, 0, 0), 1)
+
         # Add a table-like structure
-        cv2.rectangle(img, (50, 250), (750, 400), (0, 0, 0), 2)
-        cv2.line(img, (50, 300), (750, 300), (0, 0, 0), 2)
-        cv2.line(img, (400, 250), (400, 400), (0, 0, 0), 2)
-        
+        cv2.rectangle(img, (12, 62), (188, 100), (0, 0, 0), 2)
+        cv2.line(img, (12, 75), (188, 75), (0, 0, 0), 2)
+        cv2.line(img, (100, 62), (100, 100), (0, 0, 0), 2)
+
         # Save the image
-        cv2.imwrite(self.test_image_path, img)
-    
+        cv2.imwrite(cls.test_image_path, img)
+        return img
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the shared test image"""
+        if os.path.exists(cls.test_image_path):
+            os.remove(cls.test_image_path)
+
     def tearDown(self):
-        """Clean up after tests"""
-        # Remove test image if it exists
-        if os.path.exists(self.test_image_path):
-            os.remove(self.test_image_path)
-        
+        """Clean up per-test artifacts"""
         # Remove preprocessed image if it exists
         preprocessed_path = os.path.join(self.test_dir, 'preprocessed_test_image.png')
         if os.path.exists(preprocessed_path):
@@ -83,9 +103,9 @@ class TestImageProcessor(unittest.TestCase):
         except ImportError:
             self.skipTest("OpenCV not available")
         
-        # Read the test image
-        image = cv2.imread(self.test_image_path, cv2.IMREAD_GRAYSCALE)
-        
+        # Use the cached grayscale image; detect_table_areas only reads it
+        image = self.gray
+
         # Detect table areas
         table_rects = detect_table_areas(image)
         
@@ -104,9 +124,9 @@ class TestImageProcessor(unittest.TestCase):
         except ImportError:
             self.skipTest("OpenCV not available")
         
-        # Read the test image
-        image = cv2.imread(self.test_image_path)
-        
+        # Use the cached colour image; extract_roi only slices it
+        image = self.image
+
         # Extract header ROI
         header_roi = extract_roi(image, 'header')
         
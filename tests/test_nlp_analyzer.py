@@ -1,53 +1,68 @@
 import unittest
 import sys
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
 
 # Add the parent directory to sys.path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.processing.nlp_analyzer import extract_biomarkers, extract_date, extract_unit, extract_reference_range
 
+# Sample text with biomarker information, extracted once per class
+SAMPLE_TEXT = """
+Blood Test Results
+Date: 15.03.2025
+
+Total Cholesterol: 5.2 mmol/L (ref: 3.5-5.5)
+LDL-C: 3.1 mmol/L
+HDL-C: 1.5 mmol/L
+Triglycerides: 1.8 mmol/L
+Glucose: 5.5 mmol/L
+Creatinine: 80 umol/L
+ALT: 25 U/L
+AST: 22 U/L
+"""
+
+# Expected (value, unit) per biomarker in SAMPLE_TEXT
+EXPECTED_BIOMARKERS = {
+    'total_cholesterol': (5.2, 'mmol/l'),
+    'ldl_c': (3.1, 'mmol/l'),
+    'hdl_c': (1.5, 'mmol/l'),
+    'triglycerides': (1.8, 'mmol/l'),
+    'glucose': (5.5, 'mmol/l'),
+    'creatinine': (80.0, 'umol/l'),
+    'alt': (25.0, 'u/l'),
+    'ast': (22.0, 'u/l'),
+}
+
 class TestNLPAnalyzer(unittest.TestCase):
     """Tests for the NLP analyzer module"""
-    
+
+    @classmethod
+    def setUpClass(cls):
+        """Run the extraction once; every biomarker test reads the result"""
+        cls.biomarkers, cls.study_date, cls.patient_info = extract_biomarkers(SAMPLE_TEXT)
+
     def test_extract_biomarkers(self):
         """Test biomarker extraction from text"""
-        # Sample text with biomarker information
-        text = """
-        Blood Test Results
-        Date: 15.03.2025
-        
-        Total Cholesterol: 5.2 mmol/L (ref: 3.5-5.5)
-        LDL-C: 3.1 mmol/L
-        HDL-C: 1.5 mmol/L
-        Triglycerides: 1.8 mmol/L
-        Glucose: 5.5 mmol/L
-        Creatinine: 80 umol/L
-        ALT: 25 U/L
-        AST: 22 U/L
-        """
-        
-        # Extract biomarkers
-        biomarkers, study_date = extract_biomarkers(text)
-        
         # Check that biomarkers were extracted
-        self.assertIsInstance(biomarkers, dict)
-        
-        # Check that expected biomarkers are present
-        expected_biomarkers = ['total_cholesterol', 'ldl_c', 'hdl_c', 'triglycerides', 'glucose', 'creatinine', 'alt', 'ast']
-        for biomarker in expected_biomarkers:
-            self.assertIn(biomarker, biomarkers)
-        
-        # Check specific biomarker values
-        self.assertEqual(biomarkers['total_cholesterol']['value'], 5.2)
-        self.assertEqual(biomarkers['total_cholesterol']['unit'], 'mmol/l')
-        
-        # Check study date
-        self.assertIsInstance(study_date, datetime.date)
-        self.assertEqual(study_date.day, 15)
-        self.assertEqual(study_date.month, 3)
-        self.assertEqual(study_date.year, 2025)
+        self.assertIsInstance(self.biomarkers, dict)
+
+        # Check every expected biomarker independently
+        for name, (value, unit) in EXPECTED_BIOMARKERS.items():
+            with self.subTest(biomarker=name):
+                self.assertIn(name, self.biomarkers)
+                self.assertEqual(self.biomarkers[name]['value'], value)
+                self.assertEqual(self.biomarkers[name]['unit'], unit)
+
+        # Check the reference range picked up for total cholesterol
+        self.assertEqual(self.biomarkers['total_cholesterol']['reference_range_min'], 3.5)
+        self.assertEqual(self.biomarkers['total_cholesterol']['reference_range_max'], 5.5)
+
+    def test_extract_biomarkers_study_date(self):
+        """Test study date extraction alongside biomarkers"""
+        self.assertIsInstance(self.study_date, date)
+        self.assertEqual(self.study_date, date(2025, 3, 15))
     
     def test_extract_date(self):
         """Test date extraction from text"""
@@ -64,11 +79,10 @@ class TestNLPAnalyzer(unittest.TestCase):
         ]
         
         for text in date_texts:
-            date = extract_date(text)
-            self.assertIsInstance(date, datetime.date)
-            self.assertEqual(date.day, 15)
-            self.assertEqual(date.month, 3)
-            self.assertEqual(date.year, 2025)
+            with self.subTest(text=text):
+                extracted = extract_date(text)
+                self.assertIsInstance(extracted, date)
+                self.assertEqual(extracted, date(2025, 3, 15))
     
     def test_extract_unit(self):
         """Test unit extraction from text"""
@@ -100,8 +114,8 @@ class TestNLPAnalyzer(unittest.TestCase):
         ]
         
         for text, expected_unit in zip(unit_texts, expected_units):
-            unit = extract_unit(text)
-            self.assertEqual(unit, expected_unit)
+            with self.subTest(text=text):
+                self.assertEqual(extract_unit(text), expected_unit)
     
     def test_extract_reference_range(self):
         """Test reference range extraction from text"""
@@ -118,12 +132,11 @@ class TestNLPAnalyzer(unittest.TestCase):
         ]
         
         for text in range_texts:
-            range_dict = extract_reference_range(text)
-            self.assertIsInstance(range_dict, dict)
-            self.assertIn('reference_range_min', range_dict)
-            self.assertIn('reference_range_max', range_dict)
-            self.assertEqual(range_dict['reference_range_min'], 3.5)
-            self.assertEqual(range_dict['reference_range_max'], 5.5)
+            with self.subTest(text=text):
+                range_dict = extract_reference_range(text)
+                self.assertIsInstance(range_dict, dict)
+                self.assertEqual(range_dict.get('reference_range_min'), 3.5)
+                self.assertEqual(range_dict.get('reference_range_max'), 5.5)
 
 if __name__ == '__main__':
     unittest.main()
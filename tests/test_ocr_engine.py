@@ -1,32 +1,78 @@
+import importlib.util
 import unittest
 import os
 import cv2
 import numpy as np
+import shutil
 import sys
 from pathlib import Path
+from unittest.mock import patch
 
 # Add the parent directory to sys.path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.processing.ocr_engine import extract_text, extract_text_with_layout, extract_tables
 
+# Checked once at import instead of with a try/import and a fragile
+# exception-message match inside every test
+HAS_TESSERACT = (importlib.util.find_spec('pytesseract') is not None
+                 and shutil.which('tesseract') is not None)
+
+# Canned OCR output so the shape-checking tests exercise the extraction
+# functions without spawning Tesseract; only the end-to-end test runs
+# the real engine
+FAKE_TEXT = ('Blood Test Results\n'
+             'Date: 15.03.2025\n'
+             'Total Cholesterol: 5.2 mmol/L\n')
+
+_FAKE_WORDS = [
+    # (text, block_num, line_num, word_num)
+    ('Parameter', 1, 1, 1),
+    ('Value', 1, 1, 2),
+    ('Glucose', 1, 2, 1),
+    ('5.5', 1, 2, 2),
+    ('mmol/L', 1, 2, 3),
+]
+FAKE_DATA = {
+    'level': [5] * len(_FAKE_WORDS),
+    'page_num': [1] * len(_FAKE_WORDS),
+    'block_num': [word[1] for word in _FAKE_WORDS],
+    'par_num': [1] * len(_FAKE_WORDS),
+    'line_num': [word[2] for word in _FAKE_WORDS],
+    'word_num': [word[3] for word in _FAKE_WORDS],
+    'left': [50 * word[3] for word in _FAKE_WORDS],
+    'top': [30 * word[2] for word in _FAKE_WORDS],
+    'width': [80] * len(_FAKE_WORDS),
+    'height': [20] * len(_FAKE_WORDS),
+    'conf': [90] * len(_FAKE_WORDS),
+    'text': [word[0] for word in _FAKE_WORDS],
+}
+
 class TestOCREngine(unittest.TestCase):
     """Tests for the OCR engine module"""
     
-    def setUp(self):
-        """Set up test environment"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up the shared test environment once for the class
+
+        OCR tests only read the image, so drawing and PNG-encoding it per
+        test was redundant work; build it once per class instead.
+        """
         # Create a test image directory if it doesn't exist
-        self.test_dir = os.path.join(os.path.dirname(__file__), 'test_images')
-        os.makedirs(self.test_dir, exist_ok=True)
-        
-        # Create a simple test image with text
-        self.test_image_path = os.path.join(self.test_dir, 'test_ocr_image.png')
-        self.create_test_image()
-    
-    def create_test_image(self):
+        cls.test_dir = os.path.join(os.path.dirname(__file__), 'test_images')
+        os.makedirs(cls.test_dir, exist_ok=True)
+
+        # Create a simple test image with text; keep its grayscale view
+        # in memory so tests don't re-decode the PNG
+        cls.test_image_path = os.path.join(cls.test_dir, 'test_ocr_image.png')
+        cls.gray = cv2.cvtColor(cls.create_test_image(), cv2.COLOR_BGR2GRAY)
+
+    @classmethod
+    def create_test_image(cls):
         """Create a test image with some text for OCR testing"""
-        # Create a white image
-        img = np.ones((500, 800, 3), np.uint8) * 255
+        # Create a white image; full writes the constant directly instead
+        # of allocating ones and multiplying over the whole buffer
+        img = np.full((500, 800, 3), 255, np.uint8)
         
         # Add some text
         font = cv2.FONT_HERSHEY_SIMPLEX
@@ -49,112 +95,95 @@ class TestOCREngine(unittest.TestCase):
         cv2.putText(img, '5.5 mmol/L', (500, 420), font, 0.7, (0, 0, 0), 2)
         
         # Save the image
-        cv2.imwrite(self.test_image_path, img)
-    
-    def tearDown(self):
-        """Clean up after tests"""
-        # Remove test image if it exists
-        if os.path.exists(self.test_image_path):
-            os.remove(self.test_image_path)
+        cv2.imwrite(cls.test_image_path, img)
+        return img
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the shared test image"""
+        if os.path.exists(cls.test_image_path):
+            os.remove(cls.test_image_path)
     
     def test_extract_text(self):
         """Test text extraction from image"""
-        # Skip test if pytesseract is not available
-        try:
-            import pytesseract
-        except ImportError:
-            self.skipTest("Pytesseract not available")
-        
-        # Read the test image
-        image = cv2.imread(self.test_image_path, cv2.IMREAD_GRAYSCALE)
-        
-        # Extract text
-        try:
+        # Use the cached grayscale image
+        image = self.gray
+
+        # Extract text with the recognition call mocked out
+        with patch('src.processing.ocr_engine.image_to_string',
+                   return_value=FAKE_TEXT):
             text = extract_text(image)
-            
-            # Check that the result is a string
-            self.assertIsInstance(text, str)
-            
-            # Check that some expected text is in the result
-            # Note: OCR results may vary, so we use lower() and check for substrings
-            text_lower = text.lower()
-            self.assertIn('blood', text_lower)
-            self.assertIn('test', text_lower)
-            self.assertIn('cholesterol', text_lower)
-        except Exception as e:
-            # If Tesseract is not properly installed, the test will be skipped
-            if "TesseractNotFoundError" in str(e):
-                self.skipTest("Tesseract executable not found")
-            else:
-                raise
-    
+
+        # Check that the result is a string
+        self.assertIsInstance(text, str)
+
+        # Check that the recognized text is passed through
+        text_lower = text.lower()
+        self.assertIn('blood', text_lower)
+        self.assertIn('test', text_lower)
+        self.assertIn('cholesterol', text_lower)
+
+    @unittest.skipUnless(HAS_TESSERACT, "Tesseract not available")
+    def test_extract_text_end_to_end(self):
+        """Test text extraction against the real Tesseract engine"""
+        # Copy the cached image: extract_text inverts its input in place
+        # when the first OCR pass comes back empty
+        image = self.gray.copy()
+
+        # Extract text
+        text = extract_text(image)
+
+        # Check that some expected text is in the result
+        # Note: OCR results may vary, so we use lower() and check for substrings
+        text_lower = text.lower()
+        self.assertIn('blood', text_lower)
+        self.assertIn('test', text_lower)
+        self.assertIn('cholesterol', text_lower)
+
     def test_extract_text_with_layout(self):
         """Test text extraction with layout information"""
-        # Skip test if pytesseract is not available
-        try:
-            import pytesseract
-        except ImportError:
-            self.skipTest("Pytesseract not available")
-        
-        # Read the test image
-        image = cv2.imread(self.test_image_path, cv2.IMREAD_GRAYSCALE)
-        
-        # Extract text with layout
-        try:
+        # Use the cached grayscale image
+        image = self.gray
+
+        # Extract text with layout, with the recognition call mocked out
+        with patch('src.processing.ocr_engine.image_to_data',
+                   return_value=FAKE_DATA):
             layout_data = extract_text_with_layout(image)
-            
-            # Check that the result is a list
-            self.assertIsInstance(layout_data, list)
-            
-            # Check that the list contains dictionaries
-            if layout_data:
-                self.assertIsInstance(layout_data[0], dict)
-                
-                # Check that the dictionaries have the expected keys
-                expected_keys = ['text', 'x', 'y', 'width', 'height', 'conf', 'line_num', 'block_num']
-                for key in expected_keys:
-                    self.assertIn(key, layout_data[0])
-        except Exception as e:
-            # If Tesseract is not properly installed, the test will be skipped
-            if "TesseractNotFoundError" in str(e):
-                self.skipTest("Tesseract executable not found")
-            else:
-                raise
-    
+
+        # Check that the result is a list
+        self.assertIsInstance(layout_data, list)
+
+        # Check that the list contains dictionaries
+        if layout_data:
+            self.assertIsInstance(layout_data[0], dict)
+
+            # Check that the dictionaries have the expected keys
+            expected_keys = ['text', 'x', 'y', 'width', 'height', 'conf', 'line_num', 'block_num']
+            for key in expected_keys:
+                self.assertIn(key, layout_data[0])
+
     def test_extract_tables(self):
         """Test table extraction from image"""
-        # Skip test if pytesseract is not available
-        try:
-            import pytesseract
-        except ImportError:
-            self.skipTest("Pytesseract not available")
-        
-        # Read the test image
-        image = cv2.imread(self.test_image_path, cv2.IMREAD_GRAYSCALE)
-        
-        # Extract tables
-        try:
+        # Use the cached grayscale image
+        image = self.gray
+
+        # Extract tables, with the recognition call mocked out
+        with patch('src.processing.ocr_engine.image_to_data',
+                   return_value=FAKE_DATA):
             tables = extract_tables(image)
-            
-            # Check that the result is a list
-            self.assertIsInstance(tables, list)
-            
-            # Check that the list contains strings
-            if tables:
-                self.assertIsInstance(tables[0], str)
-                
-                # Check that some expected text is in the result
-                # Note: OCR results may vary, so we use lower() and check for substrings
-                tables_text = ' '.join(tables).lower()
-                self.assertIn('parameter', tables_text)
-                self.assertIn('value', tables_text)
-                self.assertIn('glucose', tables_text)
-        except Exception as e:
-            # If Tesseract is not properly installed, the test will be skipped
-            if "TesseractNotFoundError" in str(e):
-                self.skipTest("Tesseract executable not found")
-            else:
-                raise
+
+        # Check that the result is a list
+        self.assertIsInstance(tables, list)
+
+        # Check that the list contains strings
+        self.assertTrue(tables)
+        self.assertIsInstance(tables[0], str)
+
+        # Check that the recognized words are grouped into the table
+        tables_text = ' '.join(tables).lower()
+        self.assertIn('parameter', tables_text)
+        self.assertIn('value', tables_text)
+        self.assertIn('glucose', tables_text)
 
 if __name__ == '__main__':
     unittest.main()